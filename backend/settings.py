@@ -44,7 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'store.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'store.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,11 +81,74 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        # Постоянные соединения вместо нового на каждый запрос
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # BEGIN IMMEDIATE: транзакция сразу берет блокировку записи и ждет ее, а не падает с "database is locked"
+            'transaction_mode': os.environ.get('DB_SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+            'timeout': int(os.environ.get('DB_SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000,
+        },
+    }
+}
+
+# Отдельное соединение (или копия базы) для чтения каталога, см. store.db.ReadReplicaRouter
+if os.environ.get('DB_READ_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DB_READ_REPLICA'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['store.db.ReadReplicaRouter']
+
+# Прагмы SQLite для каждого нового соединения; пустое значение — не трогать
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('DB_SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('DB_SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': os.environ.get('DB_SQLITE_BUSY_TIMEOUT_MS', '5000'),
+    'mmap_size': os.environ.get('DB_SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+    'cache_size': os.environ.get('DB_SQLITE_CACHE_SIZE', '-65536'),
+    'temp_store': os.environ.get('DB_SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
+
+# Cache
+# STORE_CACHE_BACKEND: locmem (по умолчанию), file или redis (нужен пакет redis).
+# locmem — только для одного процесса: поколения каталога, версии подсказок и фасетов живут в кэше,
+# и другие воркеры их не увидят (manage.py check --deploy предупреждает об этом)
+
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'store'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', os.path.join(BASE_DIR, 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+_cache_backend, _cache_location = CACHE_BACKENDS[os.environ.get('STORE_CACHE_BACKEND', 'locmem')]
+
+CACHES = {
+    'default': {
+        'BACKEND': _cache_backend,
+        'LOCATION': os.environ.get('STORE_CACHE_LOCATION', _cache_location),
     }
 }
 
 
+# index встраивает в страницу первую страницу каталога, категории и данные пользователя (store.views.bootstrap_json)
+STORE_SSR_BOOTSTRAP = os.environ.get('STORE_SSR_BOOTSTRAP', '1') == '1'
+
+# Метрики по маршрутам (store.metrics): /metrics в формате Prometheus и заголовок Server-Timing.
+# SAMPLE_RATE — доля запросов, для которых считаются SQL и разбивка по фазам (1.0 — для отладки, не для продакшена);
+# SLOW_REQUEST_MS — порог логирования медленных запросов вместе с их SQL (logger store.slow_requests)
+
+STORE_METRICS = {
+    'SAMPLE_RATE': float(os.environ.get('METRICS_SAMPLE_RATE', 0.05)),
+    'SLOW_REQUEST_MS': int(os.environ.get('METRICS_SLOW_REQUEST_MS', 0)) or None,
+    'SERVER_TIMING': os.environ.get('METRICS_SERVER_TIMING', '1') == '1',
+    'TOKEN': os.environ.get('METRICS_TOKEN'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -119,9 +184,28 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Без DEBUG статика собирается collectstatic: минификация, хэш в именах, рядом .gz/.br
+# (brotli и rjsmin — необязательные пакеты). Отдает ее store.staticfiles.StaticFilesMiddleware
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'store.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Как отдавать тела медиафайлов: '' — сам Django (FileResponse), 'nginx' — X-Accel-Redirect
+# на internal-локацию MEDIA_ACCEL_REDIRECT_PREFIX, 'apache' — X-Sendfile (mod_xsendfile)
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# Потоков для нарезки превью обложек (store.images); 0 — резать синхронно после коммита
+COVER_RENDITION_WORKERS = int(os.environ.get('COVER_RENDITION_WORKERS', 2))
+
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 9,
@@ -1,13 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from store.views import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('store.urls')),
     path('api-auth/', include('rest_framework.urls')),
-]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    path(f'{settings.MEDIA_URL.strip("/")}/<path:path>', serve_media, name='media'),
+]
\ No newline at end of file
@@ -1,11 +1,10 @@
 import os
 import django
-import random
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 
-from store.models import Category, Book
+from store.importer import CatalogImporter
 
 data = {
     "Фантастика": [
@@ -112,32 +111,13 @@ data = {
 }
 
 def populate():
+    # Тот же импорт, что и у manage.py import_catalog, только источник — словарь data выше
     print("Начинаем наполнение базы данных...")
-
-    for cat_name, books in data.items():
-        category, created = Category.objects.get_or_create(title=cat_name)
-        if created:
-            print(f"Создана категория: {cat_name}")
-        else:
-            print(f"Категория уже есть: {cat_name}")
-
-        for book_data in books:
-            book, created = Book.objects.get_or_create(
-                title=book_data['title'],
-                defaults={
-                    'author': book_data['author'],
-                    'price': book_data['price'],
-                    'category': category,
-                    'image': book_data['image'],
-                    'description': book_data['description']
-                }
-            )
-            if created:
-                print(f"  - Добавлена книга: {book.title}")
-            else:
-                print(f"  - Книга уже существует: {book.title}")
-
-    print("Готово! База данных успешно наполнена.")
+    rows = ({'category': cat_name, **book_data} for cat_name, books in data.items() for book_data in books)
+    importer = CatalogImporter(update_existing=False)
+    importer.run(rows)
+    importer.finish()
+    print(f"Готово! Добавлено книг: {importer.created}, уже были в базе: {importer.skipped}.")
 
 if __name__ == '__main__':
-    populate()
\ No newline at end of file
+    populate()
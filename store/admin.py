@@ -1,5 +1,11 @@
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+from .analytics import sales_report
+from .exports import export_response
 from .models import Category, Book, Order, OrderItem, Cart, CartItem
+from .serializers import SalesReportSerializer
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -19,7 +25,41 @@ class OrderItemInline(admin.TabularInline):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'status', 'total_price', 'created_at')
     list_filter = ('status', 'created_at')
+    list_select_related = ('user',)
     inlines = [OrderItemInline]
+    actions = ['export_csv', 'export_jsonl']
+
+    # Выгрузка отбирает заказы по фильтрам списка и потоково отдает их вместе с позициями
+    @admin.action(description='Выгрузить выбранные заказы в CSV', permissions=['view'])
+    def export_csv(self, request, queryset):
+        return export_response(queryset, 'csv', request)
+
+    @admin.action(description='Выгрузить выбранные заказы в JSONL', permissions=['view'])
+    def export_jsonl(self, request, queryset):
+        return export_response(queryset, 'jsonl', request)
+
+    def get_urls(self):
+        return [
+            path('sales/', self.admin_site.admin_view(self.sales_dashboard), name='store_order_sales'),
+        ] + super().get_urls()
+
+    def sales_dashboard(self, request):
+        # Отчет строится только по дневным сводкам (store.analytics), история заказов не сканируется
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        params = SalesReportSerializer(data=request.GET)
+        report = None
+        if params.is_valid():
+            data = params.validated_data
+            report = sales_report(data['date_from'], data['date_to'], data['top'])
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Отчет о продажах',
+            'opts': self.model._meta,
+            'report': report,
+            'errors': params.errors,
+        }
+        return TemplateResponse(request, 'admin/store/order/sales_dashboard.html', context)
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
@@ -0,0 +1,164 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.utils import timezone
+
+from .exports import day_start
+from .models import DailyBookSales, DailyCategorySales, DailyStatusSales, Order, OrderItem
+
+# Отмененные заказы остаются в счетчике по статусам, но не входят в выручку и продажи книг
+EXCLUDED_STATUSES = ('cancelled',)
+
+
+def counts_as_sale(status):
+    return status not in EXCLUDED_STATUSES
+
+
+def order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def _increment(model, day, key_field, deltas):
+    """
+    deltas: {ключ: {поле: приращение}}. Недостающие строки создаются нулевыми,
+    затем все ключи дня сдвигаются одним UPDATE с CASE — как списание остатков при оформлении.
+    """
+    if not deltas:
+        return
+    model.objects.bulk_create([model(date=day, **{key_field: key}) for key in deltas], ignore_conflicts=True)
+    fields = {field for values in deltas.values() for field in values}
+    model.objects.filter(date=day, **{f'{key_field}__in': list(deltas)}).update(**{
+        field: F(field) + Case(
+            *[When(**{key_field: key}, then=Value(values.get(field, 0))) for key, values in deltas.items()],
+            output_field=model._meta.get_field(field),
+        )
+        for field in fields
+    })
+
+
+def _apply_items(day, items, sign):
+    """items — кортежи (book_id, category_id, quantity, price)."""
+    books, categories = {}, {}
+    for book_id, category_id, quantity, price in items:
+        for deltas, key in ((books, book_id), (categories, category_id)):
+            entry = deltas.setdefault(key, {'units': 0, 'revenue': Decimal('0')})
+            entry['units'] += sign * quantity
+            entry['revenue'] += sign * quantity * price
+    _increment(DailyBookSales, day, 'book_id', books)
+    _increment(DailyCategorySales, day, 'category_id', categories)
+
+
+def _apply_status(day, status, total_price, sign):
+    _increment(DailyStatusSales, day, 'status', {status: {'orders_count': sign, 'revenue': sign * total_price}})
+
+
+def order_items(order):
+    return list(
+        OrderItem.objects.filter(order=order).values_list('book_id', 'book__category_id', 'quantity', 'price')
+    )
+
+
+def record_order(order, items):
+    """Новый заказ при оформлении; вызывается внутри транзакции place_order."""
+    day = order_day(order)
+    _apply_status(day, order.status, order.total_price, 1)
+    if counts_as_sale(order.status):
+        _apply_items(day, items, 1)
+
+
+def record_status_change(order, old_status):
+    """Переносит заказ между статусами; при отмене (и ее снятии) списывает или возвращает его продажи."""
+    day = order_day(order)
+    _apply_status(day, old_status, order.total_price, -1)
+    _apply_status(day, order.status, order.total_price, 1)
+    if counts_as_sale(old_status) != counts_as_sale(order.status):
+        _apply_items(day, order_items(order), 1 if counts_as_sale(order.status) else -1)
+
+
+def rebuild_day(day):
+    """
+    Пересчитывает сводки одного дня из заказов. Так же исправляются расхождения после правок,
+    которые сводки не отслеживают: заказы и позиции, созданные, измененные или удаленные в админке.
+    """
+    start, end = day_start(day), day_start(day + timedelta(days=1))
+    orders = Order.objects.filter(created_at__gte=start, created_at__lt=end).order_by()
+    items = (
+        OrderItem.objects.filter(order__created_at__gte=start, order__created_at__lt=end)
+        .exclude(order__status__in=EXCLUDED_STATUSES)
+        .order_by()
+    )
+    revenue = Sum(F('quantity') * F('price'))
+    with transaction.atomic():
+        for model in (DailyStatusSales, DailyBookSales, DailyCategorySales):
+            model.objects.filter(date=day).delete()
+        DailyStatusSales.objects.bulk_create([
+            DailyStatusSales(
+                date=day, status=row['status'], orders_count=row['orders_count'], revenue=row['revenue']
+            )
+            for row in orders.values('status').annotate(orders_count=Count('id'), revenue=Sum('total_price'))
+        ])
+        DailyBookSales.objects.bulk_create([
+            DailyBookSales(date=day, book_id=row['book_id'], units=row['units'], revenue=row['revenue'])
+            for row in items.values('book_id').annotate(units=Sum('quantity'), revenue=revenue)
+        ])
+        DailyCategorySales.objects.bulk_create([
+            DailyCategorySales(
+                date=day, category_id=row['book__category_id'], units=row['units'], revenue=row['revenue']
+            )
+            for row in items.values('book__category_id').annotate(units=Sum('quantity'), revenue=revenue)
+        ])
+
+
+def sales_report(date_from, date_to, top=10):
+    """Отчет за период [date_from, date_to] только по сводкам: четыре запроса независимо от числа заказов."""
+    period = {'date__gte': date_from, 'date__lte': date_to}
+    days = {}
+
+    def day_entry(day):
+        return days.setdefault(day, {'date': day, 'orders': 0, 'revenue': Decimal('0'), 'units': 0})
+
+    by_status = defaultdict(lambda: {'orders': 0, 'revenue': Decimal('0')})
+    for row in DailyStatusSales.objects.filter(**period).values('date', 'status', 'orders_count', 'revenue'):
+        entry = day_entry(row['date'])
+        entry['orders'] += row['orders_count']
+        if counts_as_sale(row['status']):
+            entry['revenue'] += row['revenue']
+        by_status[row['status']]['orders'] += row['orders_count']
+        by_status[row['status']]['revenue'] += row['revenue']
+
+    for row in DailyCategorySales.objects.filter(**period).values('date').annotate(units=Sum('units')):
+        day_entry(row['date'])['units'] += row['units']
+
+    top_books = (
+        DailyBookSales.objects.filter(**period)
+        .values('book_id', title=F('book__title'))
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue', 'book_id')[:top]
+    )
+    categories = (
+        DailyCategorySales.objects.filter(**period)
+        .values('category_id', title=F('category__title'))
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue', 'category_id')
+    )
+
+    days = sorted(days.values(), key=lambda entry: entry['date'])
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'totals': {
+            'orders': sum(entry['orders'] for entry in days),
+            'revenue': sum((entry['revenue'] for entry in days), Decimal('0')),
+            'units': sum(entry['units'] for entry in days),
+        },
+        'days': days,
+        'by_status': [
+            {'status': status, 'label': label, **by_status[status]}
+            for status, label in Order.STATUS_CHOICES if status in by_status
+        ],
+        'top_books': list(top_books),
+        'categories': list(categories),
+    }
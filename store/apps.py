@@ -3,3 +3,13 @@ from django.apps import AppConfig
 
 class StoreConfig(AppConfig):
     name = 'store'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import checks, signals  # noqa: F401
+        from .db import configure_sqlite_connection
+        from .metrics import install_serializer_timing
+
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='store_sqlite_pragmas')
+        install_serializer_timing()
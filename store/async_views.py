@@ -0,0 +1,124 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .models import Book, Category, Favorite
+from .pagination import BookPagination, ReviewCursorPagination
+from .serializers import BookListSerializer, BookSerializer, CategorySerializer, ReviewSerializer, UserSerializer
+from .views import BOOK_DETAIL_REVIEWS_LIMIT, BookViewSet
+
+# Async-версии горячих GET-эндпоинтов: данные читаются async ORM, сериализация идет по уже
+# загруженным объектам и к базе не обращается, поэтому под ASGI нет переходов в поток.
+
+NOT_AUTHENTICATED = {'detail': 'Authentication credentials were not provided.'}
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+def book_queryset(request):
+    """
+    Каталог с теми же фильтрами, что у BookViewSet: поиск, сортировка и BookFilter.
+    Бэкенды фильтрации только собирают queryset и к базе не обращаются.
+    """
+    view = BookViewSet(request=request, action='list', format_kwarg=None)
+    queryset = BookViewSet.queryset.all()
+    for backend in BookViewSet.filter_backends:
+        queryset = backend().filter_queryset(request, queryset, view)
+    return queryset
+
+
+sync_book_list_view = BookViewSet.as_view({'get': 'list'})
+
+
+def sync_book_list(request):
+    response = sync_book_list_view(request)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+async def book_list(request):
+    # Keyset-страницы и фасеты считаются синхронно (курсор, счетчики из кэша, индекс фасетов) —
+    # такие запросы целиком отдаем BookViewSet, чтобы ответ совпадал с /api/books/
+    keyset = (
+        request.GET.get(BookPagination.mode_query_param) == 'keyset'
+        or BookPagination.cursor_query_param in request.GET
+    )
+    if keyset or request.GET.get('facets') in ('1', 'true'):
+        return await sync_to_async(sync_book_list)(request)
+
+    try:
+        queryset = book_queryset(Request(request))
+    except ValidationError as e:
+        return json_response(e.detail, status=400)
+
+    page_size = BookPagination.page_size
+    try:
+        page = int(request.GET.get('page', 1))
+        if 'page_size' in request.GET:
+            page_size = min(max(int(request.GET['page_size']), 1), BookPagination.max_page_size)
+    except ValueError:
+        page = 0
+    count = await queryset.acount()
+    last_page = max((count - 1) // page_size + 1, 1)
+    if page < 1 or page > last_page:
+        return json_response({'detail': 'Invalid page.'}, status=404)
+
+    offset = (page - 1) * page_size
+    books = [book async for book in queryset[offset:offset + page_size]]
+    url = request.build_absolute_uri()
+    return json_response({
+        'count': count,
+        'next': replace_query_param(url, 'page', page + 1) if page < last_page else None,
+        'previous': (
+            None if page == 1
+            else remove_query_param(url, 'page') if page == 2
+            else replace_query_param(url, 'page', page - 1)
+        ),
+        'results': BookListSerializer(books, many=True, context={'request': request}).data,
+    })
+
+
+async def book_detail(request, pk):
+    try:
+        book = await Book.objects.aget(pk=pk)
+    except Book.DoesNotExist:
+        return json_response({'detail': 'No Book matches the given query.'}, status=404)
+
+    paginator = ReviewCursorPagination()
+    paginator.page_size = BOOK_DETAIL_REVIEWS_LIMIT
+    rows = [
+        review async for review in
+        book.reviews.select_related('user').order_by(*paginator.ordering)[:paginator.page_size + 1]
+    ]
+    reviews = paginator.paginate_first_page(rows, request.build_absolute_uri(reverse('book-reviews', args=[book.pk])))
+
+    data = BookSerializer(book, context={'request': request}).data
+    data['reviews'] = ReviewSerializer(reviews, many=True).data
+    data['reviews_next'] = paginator.get_next_link()
+    return json_response(data)
+
+
+async def category_list(request):
+    categories = [category async for category in Category.objects.all()]
+    return json_response(CategorySerializer(categories, many=True).data)
+
+
+async def favorite_ids(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return json_response(NOT_AUTHENTICATED, status=403)
+    ids = [book_id async for book_id in Favorite.objects.filter(user=user).values_list('book_id', flat=True)]
+    return json_response(ids)
+
+
+async def profile(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return json_response(NOT_AUTHENTICATED, status=403)
+    return json_response(UserSerializer(user).data)
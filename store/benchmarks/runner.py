@@ -0,0 +1,123 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, resolve
+
+from store import urls as store_urls
+
+BASELINES_PATH = Path(__file__).resolve().parent / 'baselines.json'
+SAVEPOINT_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class ScenarioFailed(Exception):
+    pass
+
+
+def percentiles(values):
+    if len(values) < 2:
+        return values[0], values[0], values[0]
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return cuts[49], cuts[94], cuts[98]
+
+
+def count_queries(captured):
+    # Внутри TestCase каждый atomic() превращается в savepoint — служебные команды не считаем,
+    # чтобы числа совпадали с прогоном manage.py benchmark
+    return sum(1 for query in captured if not query['sql'].startswith(SAVEPOINT_PREFIXES))
+
+
+def run_scenario(scenario, ctx, iterations):
+    client = Client()
+    if scenario.auth:
+        client.force_login(ctx[scenario.auth])
+    if scenario.max_iterations:
+        iterations = min(iterations, scenario.max_iterations)
+
+    latencies, queries, sizes = [], [], []
+    for _ in range(iterations):
+        if scenario.cold:
+            cache.clear()
+        if scenario.setup:
+            scenario.setup(ctx, client)
+        path, data = scenario.build(ctx)
+        kwargs = {'data': data, 'content_type': 'application/json'} if data is not None else {}
+
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = getattr(client, scenario.method)(path, **kwargs)
+            # Потоковый ответ выполняет запросы к базе по мере чтения — читаем его внутри замера
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            latencies.append(time.perf_counter() - started)
+
+        if response.status_code != scenario.status:
+            raise ScenarioFailed(f'{scenario.name}: {path} вернул HTTP {response.status_code}, ожидался {scenario.status}')
+        queries.append(count_queries(captured))
+        sizes.append(len(body))
+
+    p50, p95, p99 = percentiles(latencies)
+    return {
+        'name': scenario.name,
+        'iterations': iterations,
+        'p50': p50,
+        'p95': p95,
+        'p99': p99,
+        # Бюджет сравнивается с худшей итерацией: первая может прогревать ленивые структуры
+        'queries': max(queries),
+        'bytes': int(statistics.mean(sizes)),
+    }
+
+
+def run_scenarios(scenarios, ctx, iterations):
+    return [run_scenario(scenario, ctx, iterations) for scenario in scenarios]
+
+
+def route_names(patterns=None):
+    names = set()
+    for pattern in store_urls.urlpatterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            names |= route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def uncovered_routes(scenarios, ctx):
+    """Маршруты store/urls.py, до которых не доходит ни один сценарий."""
+    covered = set()
+    for scenario in scenarios:
+        path = scenario.path.split('?')[0]
+        # Сценарии с id из setup (например, отзыв на удаление) разрешаем с заглушкой
+        covered.add(resolve(path.format_map(_Placeholder(ctx))).url_name)
+    return sorted(route_names() - covered)
+
+
+class _Placeholder(dict):
+    def __missing__(self, key):
+        return 1
+
+
+def load_baselines():
+    if not BASELINES_PATH.exists():
+        return {}
+    return json.loads(BASELINES_PATH.read_text())
+
+
+def save_baselines(results):
+    baselines = load_baselines()
+    baselines.update({result['name']: result['queries'] for result in results})
+    BASELINES_PATH.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + '\n')
+
+
+def regressions(results, baselines):
+    """Сценарии, которые делают больше SQL-запросов, чем записано в baselines.json."""
+    return [
+        (result['name'], result['queries'], baselines[result['name']])
+        for result in results
+        if result['name'] in baselines and result['queries'] > baselines[result['name']]
+    ]
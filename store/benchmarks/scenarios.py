@@ -0,0 +1,107 @@
+import uuid
+
+from store.models import Cart, CartItem, Review
+
+
+class Scenario:
+    """
+    Один замер: запрос к эндпоинту. path и data подставляются из контекста сида,
+    auth — ключ пользователя в контексте ('user', 'staff'),
+    setup выполняется перед каждой итерацией и в замер не попадает.
+    """
+
+    def __init__(self, name, path, method='get', data=None, auth=None, cold=False, setup=None,
+                 status=200, max_iterations=None):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.data = data
+        self.auth = auth
+        self.cold = cold
+        self.setup = setup
+        self.status = status
+        self.max_iterations = max_iterations
+
+    def build(self, ctx):
+        data = self.data(ctx) if callable(self.data) else self.data
+        return self.path.format(**ctx), data
+
+
+def _put_in_cart(ctx, client, quantity=1):
+    cart, _ = Cart.objects.get_or_create(user=ctx['user'])
+    CartItem.objects.update_or_create(cart=cart, book_id=ctx['book'], defaults={'quantity': quantity})
+
+
+def _create_review(ctx, client):
+    ctx['review'] = Review.objects.create(book_id=ctx['books'][1], user=ctx['user'], rating=4, text='Отзыв').pk
+
+
+def _login(ctx, client):
+    client.force_login(ctx['user'])
+
+
+SCENARIOS = [
+    # Анонимный каталог: cold — с пустым кэшем ответов, то есть честная работа вьюхи и базы
+    Scenario('api-root', '/api/'),
+    Scenario('book-list', '/api/books/', cold=True),
+    Scenario('book-list-cached', '/api/books/'),
+    Scenario('book-list-category', '/api/books/?category={category}&ordering=-average_rating', cold=True),
+    Scenario('book-list-search', '/api/books/?search={search}', cold=True),
+    Scenario('book-list-keyset', '/api/books/?pagination=keyset&ordering=price', cold=True),
+    Scenario('book-list-count', '/api/books/?pagination=keyset&count=1', cold=True),
+    Scenario('book-list-facets', '/api/books/?facets=1', cold=True),
+    Scenario('book-list-facets-filtered', '/api/books/?facets=1&category={category}&price_range=300-700&min_rating=3&in_stock=true', cold=True),
+    Scenario('book-detail', '/api/books/{book}/', cold=True),
+    Scenario('book-reviews', '/api/books/{book}/reviews/', cold=True),
+    Scenario('book-similar', '/api/books/{book}/similar/', cold=True),
+    Scenario('book-suggest', '/api/books/suggest/?q={prefix}'),
+    Scenario('category-list', '/api/categories/', cold=True),
+    Scenario('category-detail', '/api/categories/{category}/', cold=True),
+    Scenario('async-book-list', '/api/async/books/'),
+    Scenario('async-book-detail', '/api/async/books/{book}/'),
+    Scenario('async-category-list', '/api/async/categories/'),
+    Scenario('index', '/', cold=True),
+    Scenario('index-user', '/', auth='user'),
+    Scenario('metrics', '/metrics', auth='staff'),
+
+    # Корзина и заказы
+    Scenario('cart-list', '/api/cart/', auth='user'),
+    Scenario('cart-add', '/api/cart/add/', 'post', lambda ctx: {'book_id': ctx['book']}, auth='user'),
+    Scenario('cart-reduce', '/api/cart/reduce_quantity/', 'post', lambda ctx: {'book_id': ctx['book']},
+             auth='user', setup=lambda ctx, client: _put_in_cart(ctx, client, quantity=2)),
+    Scenario('cart-delete', '/api/cart/delete_item/', 'post', lambda ctx: {'book_id': ctx['book']},
+             auth='user', setup=_put_in_cart),
+    Scenario('cart-batch', '/api/cart/batch/', 'post', lambda ctx: {'operations': [
+        {'book_id': pk, 'delta': 1} for pk in ctx['books'][:10]
+    ]}, auth='user'),
+    Scenario('orders-list', '/api/orders/', auth='user'),
+    Scenario('orders-list-expanded', '/api/orders/?expand=items', auth='user'),
+    Scenario('orders-detail', '/api/orders/{order}/', auth='user'),
+    Scenario('orders-export-csv', '/api/export/orders/?format=csv', auth='staff'),
+    Scenario('orders-export-jsonl', '/api/export/orders/?format=jsonl&status=new', auth='staff'),
+    Scenario('sales-report', '/api/analytics/sales/', auth='staff'),
+    Scenario('orders-create', '/api/orders/', 'post', {}, auth='user', setup=_put_in_cart, status=201),
+
+    # Составные запросы
+    Scenario('bootstrap', '/api/bootstrap/', auth='user'),
+    Scenario('batch', '/api/batch/', 'post', {'requests': [
+        '/api/profile/', '/api/favorites/ids/', '/api/categories/', '/api/cart/', '/api/books/?page=2',
+    ]}, auth='user'),
+
+    # Пользователь
+    Scenario('login', '/api/login/', 'post', lambda ctx: {'username': ctx['user'].username, 'password': ctx['password']},
+             max_iterations=5),
+    Scenario('register', '/api/register/', 'post', lambda ctx: {'username': f'bench_{uuid.uuid4().hex[:12]}', 'password': 'x'},
+             status=201, max_iterations=5),
+    Scenario('logout', '/logout/', setup=_login, status=302),
+    Scenario('profile', '/api/profile/', auth='user'),
+    Scenario('profile-update', '/api/profile/', 'patch', {'first_name': 'Бенчмарк'}, auth='user'),
+    Scenario('favorites', '/api/favorites/', auth='user'),
+    Scenario('favorites-ids', '/api/favorites/ids/', auth='user'),
+    Scenario('favorites-toggle', '/api/favorites/toggle/', 'post', lambda ctx: {'book_id': ctx['book']}, auth='user'),
+    Scenario('async-favorites-ids', '/api/async/favorites/ids/', auth='user'),
+    Scenario('async-profile', '/api/async/profile/', auth='user'),
+    Scenario('review-create', '/api/reviews/', 'post', lambda ctx: {'book': ctx['books'][2], 'rating': 5, 'text': 'Отлично'},
+             auth='user', status=201),
+    Scenario('review-delete', '/api/reviews/{review}/', 'delete', auth='user', setup=_create_review, status=204),
+]
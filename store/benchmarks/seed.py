@@ -0,0 +1,98 @@
+import random
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from store.models import Book, Cart, CartItem, Category, Favorite, Order, OrderItem, Review
+
+BENCH_PASSWORD = 'bench-password'
+
+TITLE_WORDS = [
+    'Тайна', 'Дом', 'Море', 'Война', 'Мир', 'Город', 'Сад', 'Ночь', 'Звезда', 'Путь', 'Книга', 'Остров',
+    'Время', 'Песня', 'Ветер', 'Огонь', 'Зима', 'Лето', 'Код', 'Python', 'Django', 'Алгоритмы', 'Сердце', 'Тень',
+]
+AUTHOR_NAMES = ['Иван', 'Анна', 'Сергей', 'Мария', 'Дмитрий', 'Елена', 'Алексей', 'Ольга', 'Николай', 'Татьяна']
+AUTHOR_SURNAMES = ['Петров', 'Смирнов', 'Козлов', 'Иванов', 'Соколов', 'Морозов', 'Волков', 'Лебедев', 'Новиков']
+
+
+def seed_catalog(books=20000, users=2000, reviews=100000, carts=500, categories=20, batch_size=2000, rng_seed=42):
+    """
+    Заполняет базу синтетическим каталогом через bulk_create и возвращает контекст
+    с идентификаторами, которые используют сценарии бенчмарка.
+    """
+    rng = random.Random(rng_seed)
+
+    category_objs = Category.objects.bulk_create([Category(title=f'Категория {i}') for i in range(categories)])
+
+    password = make_password(BENCH_PASSWORD)
+    user_objs = User.objects.bulk_create(
+        [User(username=f'bench_user_{i}', password=password) for i in range(users)], batch_size=batch_size
+    )
+
+    staff = User.objects.create(username='bench_staff', password=password, is_staff=True)
+
+    book_objs = []
+    for start in range(0, books, batch_size):
+        book_objs += Book.objects.bulk_create([
+            Book(
+                category=rng.choice(category_objs),
+                title=f'{rng.choice(TITLE_WORDS)} {rng.choice(TITLE_WORDS).lower()} {i}',
+                author=f'{rng.choice(AUTHOR_NAMES)} {rng.choice(AUTHOR_SURNAMES)}',
+                description='Синтетическая книга для нагрузочного тестирования.',
+                price=Decimal(rng.randint(100, 3000)),
+                stock=rng.randint(0, 50),
+            )
+            for i in range(start, min(start + batch_size, books))
+        ])
+
+    # Первой книге и первому пользователю достается заметная доля отзывов и заказов —
+    # на них смотрят сценарии карточки книги и истории заказов
+    review_objs = [
+        Review(book=book_objs[0] if i % 50 == 0 else rng.choice(book_objs), user=rng.choice(user_objs),
+               rating=rng.randint(1, 5), text='Отзыв')
+        for i in range(reviews)
+    ]
+    Review.objects.bulk_create(review_objs, batch_size=batch_size)
+
+    Favorite.objects.bulk_create(
+        [Favorite(user=user_objs[0], book=book) for book in rng.sample(book_objs, min(50, len(book_objs)))]
+        + [Favorite(user=user, book=rng.choice(book_objs)) for user in user_objs[1:]],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+
+    cart_objs = Cart.objects.bulk_create([Cart(user=user) for user in user_objs[:carts]])
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, book=book, quantity=1)
+        for cart in cart_objs for book in rng.sample(book_objs, min(3, len(book_objs)))
+    ], batch_size=batch_size, ignore_conflicts=True)
+
+    order_objs = Order.objects.bulk_create([Order(user=user_objs[0], total_price=0) for _ in range(30)])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, book=book, quantity=1, price=book.price, book_title=book.title)
+        for order in order_objs for book in rng.sample(book_objs, min(3, len(book_objs)))
+    ])
+
+    # Книги из сценариев корзины и оформления заказа не должны упираться в остаток
+    Book.objects.filter(pk__in=[book.pk for book in book_objs[:50]]).update(stock=100000)
+
+    # bulk_create обходит сигналы — агрегаты рейтинга, поисковый индекс, сводки продаж
+    # и похожие книги пересобираем явно
+    call_command('rebuild_book_ratings', stdout=StringIO())
+    call_command('rebuild_search_index', stdout=StringIO())
+    call_command('rebuild_sales_rollups', stdout=StringIO())
+    call_command('build_recommendations', stdout=StringIO())
+
+    return {
+        'user': user_objs[0],
+        'staff': staff,
+        'password': BENCH_PASSWORD,
+        'book': book_objs[0].pk,
+        'books': [book.pk for book in book_objs[:50]],
+        'category': category_objs[0].pk,
+        'order': order_objs[0].pk,
+        'search': 'тайна',
+        'prefix': 'тай',
+    }
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+RESPONSE_CACHE_TIMEOUT = 300
+# Сколько секунд устаревший ответ может отдаваться, пока один запрос пересобирает свежий
+STALE_WHILE_REVALIDATE = 30
+
+
+def generation_key(group):
+    return f'store:generation:{group}'
+
+
+def current_generation(group='catalog'):
+    return cache.get(generation_key(group), 0)
+
+
+def bump_generation(group='catalog'):
+    # Ключи не удаляются: новое поколение просто делает старые ответы устаревшими
+    key = generation_key(group)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def response_cache_key(group, view, request):
+    params = sorted(request.query_params.lists())
+    # Хост и схема — часть ключа: в ответах абсолютные ссылки (next/previous, обложки)
+    raw = json.dumps([request.scheme, request.get_host(), request.path, params, request.accepted_media_type])
+    return f'store:response:{group}:{view.basename}:{view.action}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def entry_response(request, entry, status):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    response['Cache-Control'] = f'public, max-age=0, stale-while-revalidate={STALE_WHILE_REVALIDATE}'
+    response['X-Cache'] = status
+    return get_conditional_response(
+        request, etag=entry['etag'], last_modified=int(entry['last_modified']), response=response
+    )
+
+
+def cache_response(group='catalog'):
+    """
+    Кэширует ответы GET для анонимных пользователей. Ключ учитывает хост, путь, все query-параметры
+    и формат ответа; инвалидация — сменой поколения группы (bump_generation).
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.user.is_authenticated:
+                return method(self, request, *args, **kwargs)
+
+            key = response_cache_key(group, self, request)
+            generation = current_generation(group)
+            entry = cache.get(key)
+            if entry is not None and entry['generation'] == generation:
+                return entry_response(request, entry, 'HIT')
+            locked = False
+            if entry is not None:
+                if not cache.add(key + ':lock', 1, STALE_WHILE_REVALIDATE):
+                    return entry_response(request, entry, 'STALE')
+                locked = True
+
+            try:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                response = self.finalize_response(request, response, *args, **kwargs)
+                response.render()
+                entry = {
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                    'etag': quote_etag(hashlib.md5(response.content).hexdigest()),
+                    'last_modified': time.time(),
+                    'generation': generation,
+                }
+                cache.set(key, entry, RESPONSE_CACHE_TIMEOUT)
+            finally:
+                if locked:
+                    cache.delete(key + ':lock')
+            return entry_response(request, entry, 'MISS')
+        return wrapper
+    return decorator
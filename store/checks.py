@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Кэши, которые не видны другим процессам: поколение каталога (caching.bump_generation) и версия
+# индекса подсказок остаются в памяти одного воркера, остальные не узнают об изменениях
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f'Кэш по умолчанию ({backend}) не общий для процессов: при нескольких воркерах кэш ответов, '
+        'счетчики фасетов и подсказки поиска в остальных воркерах не сбрасываются после изменений каталога.',
+        hint='Для нескольких воркеров задайте STORE_CACHE_BACKEND=redis (или file на одном сервере).',
+        id='store.W001',
+    )]
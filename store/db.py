@@ -0,0 +1,47 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+PRAGMA_VALUE_RE = re.compile(r'-?\w+')
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    # Прагмы применяются к каждому новому соединению SQLite (основному и реплике)
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            if value in (None, ''):
+                continue
+            if not PRAGMA_VALUE_RE.fullmatch(str(value)):
+                raise ImproperlyConfigured(f'Некорректное значение PRAGMA {pragma}: {value!r}')
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+class ReadReplicaRouter:
+    """
+    Чтение каталога (книги, категории, отзывы) идет в базу 'replica', если она настроена.
+    Записи и любые чтения внутри транзакции остаются на основной базе.
+    """
+    replica = 'replica'
+    catalog_models = {'book', 'category', 'review'}
+
+    def db_for_read(self, model, **hints):
+        if self.replica not in settings.DATABASES:
+            return None
+        if model._meta.app_label != 'store' or model._meta.model_name not in self.catalog_models:
+            return None
+        if connections['default'].in_atomic_block:
+            return 'default'
+        return self.replica
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,127 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+# Строки склеиваются в куски ответа: меньше итераций WSGI-сервера, память от размера выгрузки не зависит
+LINES_PER_CHUNK = 500
+
+ORDER_FIELDS = ['id', 'created_at', 'status', 'user__username', 'total_price']
+ITEM_FIELDS = ['items__book_id', 'items__book_title', 'items__quantity', 'items__price']
+CSV_HEADER = [
+    'order_id', 'created_at', 'status', 'username', 'total_price',
+    'book_id', 'book_title', 'quantity', 'price',
+]
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def day_start(day):
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def filter_orders(queryset, date_from=None, date_to=None, statuses=None):
+    # Границы дат — диапазоном по created_at, а не created_at__date: так работает индекс
+    if date_from:
+        queryset = queryset.filter(created_at__gte=day_start(date_from))
+    if date_to:
+        queryset = queryset.filter(created_at__lt=day_start(date_to + timedelta(days=1)))
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    return queryset
+
+
+def order_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Заказы вместе с позициями одним запросом (LEFT JOIN), кортежами ORDER_FIELDS + ITEM_FIELDS.
+    iterator() читает результат пачками по chunk_size, позиции одного заказа идут подряд.
+    """
+    return (
+        queryset.order_by('id', 'items__id')
+        .values_list(*ORDER_FIELDS, *ITEM_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Echo:
+    # csv.writer пишет в «файл», который просто возвращает строку
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order_id, created_at, status, username, total_price, *item in rows:
+        yield writer.writerow([order_id, created_at.isoformat(), status, username, total_price, *item])
+
+
+def jsonl_lines(rows):
+    # Одна строка на заказ, позиции вложены списком
+    for _, group in groupby(rows, key=itemgetter(0)):
+        group = list(group)
+        order_id, created_at, status, username, total_price = group[0][:len(ORDER_FIELDS)]
+        items = [
+            {'book_id': book_id, 'book_title': book_title, 'quantity': quantity, 'price': str(price)}
+            for book_id, book_title, quantity, price in (row[len(ORDER_FIELDS):] for row in group)
+            if book_id is not None
+        ]
+        yield json.dumps({
+            'id': order_id,
+            'created_at': created_at.isoformat(),
+            'status': status,
+            'username': username,
+            'total_price': str(total_price),
+            'items': items,
+        }, ensure_ascii=False) + '\n'
+
+
+EXPORTERS = {'csv': csv_lines, 'jsonl': jsonl_lines}
+
+
+def chunked(lines, size=LINES_PER_CHUNK):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+async def iterate_async(chunks):
+    """
+    Под ASGI Django собирает синхронный streaming_content в список целиком до первого байта.
+    Здесь каждый кусок читается своим sync_to_async — в том же потоке, что и курсор iterator(),
+    так что в памяти по-прежнему не больше одного куска.
+    """
+    chunks = iter(chunks)
+    done = object()
+    while True:
+        chunk = await sync_to_async(next)(chunks, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+def export_response(queryset, export_format='csv', request=None):
+    lines = EXPORTERS[export_format](order_rows(queryset))
+    content = chunked(lines)
+    if isinstance(request, ASGIRequest):
+        content = iterate_async(content)
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[export_format])
+    filename = f'orders-{timezone.now():%Y%m%d-%H%M}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
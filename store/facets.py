@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import Counter, defaultdict
+
+from .caching import current_generation
+from .filters import PRICE_RANGES, price_range_key
+
+# Индекс пересобирается по смене поколения каталога (любая запись в Book, отзывы, остатки),
+# но не чаще раза в VERSION_CHECK_INTERVAL секунд на воркер: счетчики могут отставать на эти секунды.
+# Поколение хранится в кэше Django — с несколькими воркерами он должен быть общим (см. checks.check_shared_cache)
+VERSION_CHECK_INTERVAL = 5.0
+RATING_THRESHOLDS = (4, 3, 2, 1)
+AUTHOR_FACET_LIMIT = 20
+# Для авторов заводим битовые карты только у самых многотомных: карта весит (число книг / 8) байт
+AUTHOR_BITMAP_LIMIT = 200
+# Если под фильтром книг меньше, авторы считаются точным перебором позиций, иначе — по картам топ-авторов
+AUTHOR_SCAN_LIMIT = 20000
+
+# Смещения установленных битов для каждого значения байта
+BYTE_BITS = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+
+
+def _bitmap(positions, size):
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _positions(bitmap, size):
+    for index, value in enumerate(bitmap.to_bytes((size + 7) // 8, 'little')):
+        if value:
+            base = index << 3
+            for bit in BYTE_BITS[value]:
+                yield base + bit
+
+
+class FacetIndex:
+    """
+    Каталог в виде битовых карт: у каждого значения фасета — целое число, где бит i
+    означает i-ю книгу. Фильтр — AND/OR карт, счетчик — число единиц (int.bit_count).
+    """
+
+    def __init__(self, rows):
+        self.positions = {}
+        self.author_at = []
+        self.rating_at = []
+        groups = defaultdict(lambda: defaultdict(list))
+        for position, (pk, category_id, author, price, avg_rating, stock) in enumerate(rows):
+            self.positions[pk] = position
+            self.author_at.append(author)
+            self.rating_at.append(avg_rating)
+            groups['category'][category_id].append(position)
+            groups['author'][author].append(position)
+            groups['price_range'][price_range_key(price)].append(position)
+            for threshold in RATING_THRESHOLDS:
+                if avg_rating >= threshold:
+                    groups['min_rating'][threshold].append(position)
+            groups['in_stock'][stock > 0].append(position)
+
+        self.size = size = len(self.positions)
+        self.all = (1 << size) - 1
+        self.categories = {key: _bitmap(items, size) for key, items in groups['category'].items()}
+        self.price_ranges = {key: _bitmap(groups['price_range'][key], size) for key in PRICE_RANGES}
+        self.ratings = {key: _bitmap(groups['min_rating'][key], size) for key in RATING_THRESHOLDS}
+        self.in_stock = _bitmap(groups['in_stock'][True], size)
+        self.author_positions = groups['author']
+        top_authors = sorted(self.author_positions, key=lambda name: (-len(self.author_positions[name]), name))
+        self.author_bitmaps = {
+            name: _bitmap(self.author_positions[name], size) for name in top_authors[:AUTHOR_BITMAP_LIMIT]
+        }
+
+    def author_bitmap(self, name):
+        bitmap = self.author_bitmaps.get(name)
+        if bitmap is None:
+            bitmap = _bitmap(self.author_positions.get(name, ()), self.size)
+        return bitmap
+
+    def rating_bitmap(self, min_rating):
+        bitmap = self.ratings.get(min_rating)
+        if bitmap is None:
+            bitmap = _bitmap((p for p, rating in enumerate(self.rating_at) if rating >= min_rating), self.size)
+        return bitmap
+
+    def ids_bitmap(self, ids):
+        return _bitmap((self.positions[pk] for pk in ids if pk in self.positions), self.size)
+
+    def masks(self, params):
+        """Маска каждого заданного фильтра; незаданные фильтры ничего не отсекают."""
+        masks = {}
+        if params.get('category'):
+            masks['category'] = self.union(self.categories.get(pk, 0) for pk in params['category'])
+        if params.get('author'):
+            masks['author'] = self.union(self.author_bitmap(name) for name in params['author'])
+        if params.get('price_range'):
+            masks['price_range'] = self.union(self.price_ranges[key] for key in params['price_range'])
+        if params.get('min_rating') is not None:
+            masks['min_rating'] = self.rating_bitmap(params['min_rating'])
+        if params.get('in_stock') is not None:
+            masks['in_stock'] = self.in_stock if params['in_stock'] else self.all & ~self.in_stock
+        return masks
+
+    @staticmethod
+    def union(bitmaps):
+        result = 0
+        for bitmap in bitmaps:
+            result |= bitmap
+        return result
+
+    def counts(self, params, restrict=None):
+        """
+        Счетчики фасетов в стиле «ИЛИ внутри фасета»: для каждого фасета применяются все фильтры,
+        кроме его собственного, чтобы было видно, сколько книг добавит соседний вариант.
+        restrict — битовая карта дополнительного ограничения (например, результатов поиска).
+        """
+        masks = self.masks(params)
+        base = self.all if restrict is None else restrict
+
+        def without(facet):
+            mask = base
+            for name, bitmap in masks.items():
+                if name != facet:
+                    mask &= bitmap
+            return mask
+
+        def options(bitmaps, mask, selected=()):
+            return [
+                {'value': value, 'count': count}
+                for value, count in ((value, (bitmap & mask).bit_count()) for value, bitmap in bitmaps)
+                if count or value in selected
+            ]
+
+        mask = without('category')
+        categories = options(sorted(self.categories.items()), mask, params.get('category') or ())
+        mask = without('price_range')
+        price_ranges = options(self.price_ranges.items(), mask, params.get('price_range') or ())
+        mask = without('min_rating')
+        ratings = options(self.ratings.items(), mask)
+        mask = without('in_stock')
+        in_stock = [{'value': True, 'count': (self.in_stock & mask).bit_count()}]
+
+        return {
+            'total': without(None).bit_count(),
+            'category': categories,
+            'author': self.author_counts(without('author'), params.get('author') or ()),
+            'price_range': price_ranges,
+            'min_rating': ratings,
+            'in_stock': in_stock,
+        }
+
+    def author_counts(self, mask, selected):
+        if mask.bit_count() <= AUTHOR_SCAN_LIMIT:
+            counter = Counter(self.author_at[position] for position in _positions(mask, self.size))
+        else:
+            counter = Counter({name: (bitmap & mask).bit_count() for name, bitmap in self.author_bitmaps.items()})
+        top = [name for name, count in counter.most_common(AUTHOR_FACET_LIMIT) if count]
+        top += [name for name in selected if name not in top]
+        result = []
+        for name in top:
+            count = counter[name] if name in counter else (self.author_bitmap(name) & mask).bit_count()
+            result.append({'value': name, 'count': count})
+        return result
+
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+_checked_at = 0.0
+
+
+def get_index():
+    global _index, _index_version, _checked_at
+    now = time.monotonic()
+    index = _index
+    if index is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return index
+    version = current_generation()
+    with _lock:
+        if _index is None or _index_version != version:
+            from .models import Book
+
+            rows = Book.objects.order_by('id').values_list(
+                'id', 'category_id', 'author', 'price', 'avg_rating', 'stock'
+            )
+            _index = FacetIndex(rows.iterator(chunk_size=5000))
+            _index_version = version
+        _checked_at = now
+        return _index
+
+
+def facet_counts(params, restrict_ids=None):
+    """params — cleaned_data BookFilter; restrict_ids — id книг, найденных поиском, если он задан."""
+    index = get_index()
+    restrict = None if restrict_ids is None else index.ids_bitmap(restrict_ids)
+    return index.counts(params, restrict)
@@ -0,0 +1,77 @@
+from decimal import Decimal
+
+from django import forms
+from django.db.models import Q
+from django_filters import rest_framework as django_filters
+from rest_framework import filters
+
+from .models import Book
+from .search import get_search_backend
+
+# Диапазоны цен для ?price_range= и фасетов: ключ -> (от, до), верхняя граница не включается
+PRICE_RANGES = {
+    '0-300': (None, Decimal('300')),
+    '300-700': (Decimal('300'), Decimal('700')),
+    '700-1500': (Decimal('700'), Decimal('1500')),
+    '1500-3000': (Decimal('1500'), Decimal('3000')),
+    '3000-': (Decimal('3000'), None),
+}
+
+
+def price_range_key(price):
+    for key, (low, high) in PRICE_RANGES.items():
+        if (low is None or price >= low) and (high is None or price < high):
+            return key
+    return None
+
+
+class BookSearchFilter(filters.SearchFilter):
+    # ?search= уходит в полнотекстовый индекс вместо icontains по search_fields
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return get_search_backend().search(queryset, query)
+
+
+class MultipleValueField(forms.TypedMultipleChoiceField):
+    # Варианты заранее не перечисляются (авторов и категорий тысячи) — проверяется только тип значения
+    def valid_value(self, value):
+        return True
+
+
+class MultipleValueFilter(django_filters.MultipleChoiceFilter):
+    field_class = MultipleValueField
+
+
+class BookFilter(django_filters.FilterSet):
+    """
+    Фильтры каталога. Внутри одного параметра значения объединяются через ИЛИ
+    (?author=A&author=B), разные параметры — через И. Фасеты считает store.facets.
+    """
+    category = MultipleValueFilter(field_name='category', coerce=int)
+    author = MultipleValueFilter(field_name='author')
+    price_range = django_filters.MultipleChoiceFilter(
+        choices=[(key, key) for key in PRICE_RANGES], method='filter_price_range'
+    )
+    min_rating = django_filters.NumberFilter(field_name='avg_rating', lookup_expr='gte')
+    in_stock = django_filters.BooleanFilter(method='filter_in_stock')
+
+    class Meta:
+        model = Book
+        fields = ['category', 'author', 'price_range', 'min_rating', 'in_stock']
+
+    def filter_price_range(self, queryset, name, value):
+        condition = Q()
+        for key in value:
+            low, high = PRICE_RANGES[key]
+            bounds = {}
+            if low is not None:
+                bounds['price__gte'] = low
+            if high is not None:
+                bounds['price__lt'] = high
+            condition |= Q(**bounds)
+        return queryset.filter(condition)
+
+    def filter_in_stock(self, queryset, name, value):
+        return queryset.filter(stock__gt=0) if value else queryset.filter(stock=0)
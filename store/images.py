@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+from .caching import bump_generation
+from .models import Book
+
+logger = logging.getLogger(__name__)
+
+# Ширины превью для srcset: карточка каталога, ретина-карточка, модальное окно
+COVER_WIDTHS = (160, 320, 640)
+COVER_FORMATS = {
+    'avif': {'format': 'AVIF', 'quality': 50, 'speed': 6},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+}
+RENDITIONS_DIR = 'books/renditions'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def available_formats():
+    return [fmt for fmt in COVER_FORMATS if features.check(fmt)]
+
+
+def has_local_image(book):
+    # Часть книг из populate_db хранит в image внешний URL — такие обложки не обрабатываем
+    return bool(book.image) and not book.image.name.startswith(('http://', 'https://'))
+
+
+def render_cover(source, width, fmt):
+    image = source.copy()
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS, reducing_gap=3.0)
+    buffer = BytesIO()
+    image.save(buffer, **COVER_FORMATS[fmt])
+    return buffer.getvalue(), image.width, image.height
+
+
+def generate_renditions(book):
+    """
+    Нарезает обложку книги на превью COVER_WIDTHS во всех доступных форматах и возвращает
+    описание для Book.cover_renditions. Имена файлов строятся от хэша исходника,
+    поэтому одинаковые обложки делят одни и те же превью.
+    """
+    storage = book.image.storage
+    with book.image.open('rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+
+    with Image.open(BytesIO(data)) as original:
+        source = ImageOps.exif_transpose(original)
+        source = source.convert('RGBA' if source.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    renditions = []
+    # Превью шире исходника не делаем: оставляем одну ширину «как есть»
+    widths = [width for width in COVER_WIDTHS if width < source.width] + [min(source.width, COVER_WIDTHS[-1])]
+    for fmt in available_formats():
+        for width in sorted(set(widths)):
+            name = f'{RENDITIONS_DIR}/{digest}-{width}w.{fmt}'
+            if storage.exists(name):
+                with storage.open(name) as f, Image.open(f) as existing:
+                    actual_width, actual_height = existing.size
+            else:
+                content, actual_width, actual_height = render_cover(source, width, fmt)
+                # Имя превью уже построено от хэша исходника — повторно не хэшируем
+                name = storage.save(name, ContentFile(content), hashed=True)
+            renditions.append({'name': name, 'format': fmt, 'width': actual_width, 'height': actual_height})
+    return {'source': book.image.name, 'renditions': renditions}
+
+
+def srcset_data(cover_renditions):
+    """{'width', 'height', 'sources': {формат: srcset}} для фронтенда или None, пока превью нет."""
+    renditions = cover_renditions.get('renditions') if cover_renditions else None
+    if not renditions:
+        return None
+    storage = Book._meta.get_field('image').storage
+    sources = {}
+    for item in renditions:
+        sources.setdefault(item['format'], []).append(f'{storage.url(item["name"])} {item["width"]}w')
+    largest = max(renditions, key=lambda item: item['width'])
+    return {
+        'width': largest['width'],
+        'height': largest['height'],
+        'sources': {fmt: ', '.join(entries) for fmt, entries in sources.items()},
+    }
+
+
+def process_book(book_id, force=False):
+    book = Book.objects.filter(pk=book_id).only('id', 'image', 'cover_renditions').first()
+    if book is None or not has_local_image(book):
+        return False
+    if not force and book.cover_renditions.get('source') == book.image.name:
+        return False
+    renditions = generate_renditions(book)
+    # update() вместо save(): сигналы Book (поисковый индекс) здесь не нужны
+    Book.objects.filter(pk=book_id, image=book.image.name).update(cover_renditions=renditions)
+    return True
+
+
+def _process_and_bump(book_id):
+    try:
+        if process_book(book_id):
+            bump_generation()
+    except Exception:
+        logger.exception('Не удалось сделать превью обложки книги %s', book_id)
+
+
+def _run_in_worker(book_id):
+    try:
+        _process_and_bump(book_id)
+    finally:
+        # У потока пула свое соединение с базой: закрываем его по тем же правилам CONN_MAX_AGE, что и в запросах
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.COVER_RENDITION_WORKERS, thread_name_prefix='cover-renditions'
+            )
+        return _executor
+
+
+def schedule_renditions(book):
+    """Ставит нарезку превью в пул после коммита; при COVER_RENDITION_WORKERS = 0 — синхронно."""
+    if not has_local_image(book) or book.cover_renditions.get('source') == book.image.name:
+        return
+    if settings.COVER_RENDITION_WORKERS:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_worker, book.pk))
+    else:
+        transaction.on_commit(lambda: _process_and_bump(book.pk))
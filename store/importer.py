@@ -0,0 +1,172 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from io import StringIO
+from itertools import islice
+
+from django.core.management import call_command
+from django.db import transaction
+
+from . import suggest
+from .caching import bump_generation
+from .images import schedule_renditions
+from .models import Book, Category
+from .search import normalize_text
+
+UPDATE_FIELDS = ['category', 'author', 'price', 'description', 'stock']
+# Обложку обновляем, только если она есть в фиде: пустая колонка не должна стирать загруженные обложки
+UPDATE_FIELDS_WITH_IMAGE = UPDATE_FIELDS + ['image']
+DEFAULT_STOCK = 10
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def clean_text(value):
+    return ' '.join(str(value or '').split())
+
+
+def title_key(title):
+    # Ключ дедупликации: регистр, ё/е и лишние пробелы различием не считаются
+    return normalize_text(clean_text(title))
+
+
+def normalize_row(raw):
+    row = {name: clean_text(raw.get(name)) for name in ('title', 'author', 'category', 'image')}
+    for name in ('title', 'author', 'category'):
+        if not row[name]:
+            raise RowError(f'не заполнено поле {name}')
+    row['description'] = str(raw.get('description') or '').strip()
+    try:
+        row['price'] = Decimal(str(raw.get('price', '')).replace(',', '.').strip()).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise RowError(f'некорректная цена {raw.get("price")!r}')
+    if row['price'] < 0:
+        raise RowError('отрицательная цена')
+    stock = raw.get('stock')
+    try:
+        row['stock'] = DEFAULT_STOCK if stock in (None, '') else int(stock)
+    except (TypeError, ValueError):
+        raise RowError(f'некорректный остаток {stock!r}')
+    if row['stock'] < 0:
+        raise RowError('отрицательный остаток')
+    return row
+
+
+class CatalogImporter:
+    """
+    Пакетный импорт каталога: строки нормализуются, дедуплицируются по названию
+    (внутри пакета побеждает последняя) и пишутся bulk_create (для существующих — upsert),
+    каждый пакет — в своей транзакции.
+    bulk-операции обходят сигналы, поэтому поисковый индекс и кэши обновляет finish().
+    index_pending — каталог менялся, а индекс еще не перестроен; при продолжении после сбоя
+    флаг берется из файла прогресса, иначе изменения прошлых запусков остались бы без индекса.
+    """
+
+    def __init__(self, batch_size=2000, update_existing=True, index_pending=False):
+        self.batch_size = batch_size
+        self.update_existing = update_existing
+        self.index_pending = index_pending
+        self.created = self.updated = self.skipped = 0
+        self.errors = []
+        self.books = {title_key(title): pk for pk, title in Book.objects.values_list('id', 'title').iterator()}
+        self.categories = {title_key(title): pk for pk, title in Category.objects.values_list('id', 'title')}
+
+    def run(self, rows, start=0, on_batch=None):
+        """
+        rows — итератор словарей; первые start строк пропускаются (продолжение после сбоя).
+        on_batch(processed) вызывается после коммита каждого пакета.
+        """
+        processed = start
+        numbered = enumerate(islice(rows, start, None), start + 1)
+        while True:
+            batch = list(islice(numbered, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+            processed += len(batch)
+            if on_batch:
+                on_batch(processed)
+        return processed
+
+    def import_batch(self, batch):
+        rows = {}
+        for line, raw in batch:
+            try:
+                row = normalize_row(raw)
+            except RowError as exc:
+                self.errors.append((line, str(exc)))
+                continue
+            key = title_key(row['title'])
+            if key in rows:
+                self.skipped += 1
+            rows[key] = row
+
+        with transaction.atomic():
+            missing = {title_key(row['category']): row['category'] for row in rows.values()}
+            missing = {key: title for key, title in missing.items() if key not in self.categories}
+            if missing:
+                Category.objects.bulk_create([Category(title=title) for title in missing.values()])
+                for pk, title in Category.objects.filter(title__in=missing.values()).values_list('id', 'title'):
+                    self.categories[title_key(title)] = pk
+
+            to_create, to_update = [], []
+            for key, row in rows.items():
+                book = Book(
+                    category_id=self.categories[title_key(row['category'])],
+                    title=row['title'], author=row['author'], price=row['price'],
+                    description=row['description'], image=row['image'] or None, stock=row['stock'],
+                )
+                if key not in self.books:
+                    to_create.append(book)
+                elif self.update_existing:
+                    book.pk = self.books[key]
+                    to_update.append(book)
+                else:
+                    self.skipped += 1
+
+            if to_create:
+                Book.objects.bulk_create(to_create)
+                for book in to_create:
+                    self.books[title_key(book.title)] = book.pk
+            # Upsert по первичному ключу вместо bulk_update: тот строит CASE WHEN на каждое поле
+            # и на сотнях тысяч строк упирается в компиляцию выражений
+            for books, fields in (
+                ([book for book in to_update if book.image], UPDATE_FIELDS_WITH_IMAGE),
+                ([book for book in to_update if not book.image], UPDATE_FIELDS),
+            ):
+                if books:
+                    Book.objects.bulk_create(books, update_conflicts=True, unique_fields=['id'], update_fields=fields)
+
+            # Превью нарезаются после коммита пакета; уже нарезанные для той же обложки пропускаются
+            with_image = [book.pk for book in to_create + to_update if book.image]
+            for book in Book.objects.filter(pk__in=with_image).only('id', 'image', 'cover_renditions'):
+                schedule_renditions(book)
+
+        self.created += len(to_create)
+        self.updated += len(to_update)
+        if to_create or to_update:
+            self.index_pending = True
+
+    def finish(self):
+        if self.index_pending:
+            call_command('rebuild_search_index', stdout=StringIO())
+            suggest.invalidate()
+            bump_generation()
+            self.index_pending = False
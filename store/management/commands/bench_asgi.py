@@ -0,0 +1,87 @@
+import asyncio
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+
+from store.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность sync DRF-вьюх и их async-версий под ASGI '
+        '(in-process AsyncClient, текущая база данных)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help='Запросов на эндпоинт')
+        parser.add_argument('--concurrency', type=int, default=20, help='Одновременных запросов')
+        parser.add_argument('--username', help='Пользователь для авторизованных эндпоинтов (по умолчанию — первый)')
+
+    def handle(self, *args, **options):
+        book = Book.objects.order_by('id').first()
+        if book is None:
+            raise CommandError('В базе нет книг — нечего измерять')
+        users = User.objects.order_by('id')
+        user = users.filter(username=options['username']).first() if options['username'] else users.first()
+
+        pairs = [
+            ('books list', '/api/books/', '/api/async/books/'),
+            ('book detail', f'/api/books/{book.pk}/', f'/api/async/books/{book.pk}/'),
+            ('categories', '/api/categories/', '/api/async/categories/'),
+        ]
+        if user is not None:
+            pairs += [
+                ('favorites ids', '/api/favorites/ids/', '/api/async/favorites/ids/'),
+                ('profile', '/api/profile/', '/api/async/profile/'),
+            ]
+        else:
+            self.stdout.write(self.style.WARNING(
+                'Пользователей нет: авторизованные эндпоинты пропущены, анонимный каталог идет через кэш ответов'
+            ))
+
+        # AsyncClient ходит с Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            results = asyncio.run(self.run(pairs, user, options['requests'], options['concurrency']))
+
+        self.stdout.write(f'{"endpoint":<16}{"sync rps":>10}{"async rps":>11}{"sync p50":>10}{"async p50":>11}{"x":>7}')
+        for name, sync, async_ in results:
+            self.stdout.write(
+                f'{name:<16}{sync[0]:>10.0f}{async_[0]:>11.0f}'
+                f'{sync[1] * 1000:>8.2f}ms{async_[1] * 1000:>9.2f}ms{async_[0] / sync[0]:>7.2f}'
+            )
+
+    async def run(self, pairs, user, requests, concurrency):
+        client = AsyncClient()
+        if user is not None:
+            # Авторизованный клиент обходит кэш анонимных ответов — сравниваем сами вьюхи
+            await client.aforce_login(user)
+        results = []
+        for name, sync_path, async_path in pairs:
+            # Прогрев: соединения, ленивые индексы, импорт модулей
+            await client.get(sync_path)
+            await client.get(async_path)
+            sync = await self.measure(client, sync_path, requests, concurrency)
+            async_ = await self.measure(client, async_path, requests, concurrency)
+            results.append((name, sync, async_))
+        return results
+
+    async def measure(self, client, path, requests, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f'{path}: HTTP {response.status_code}')
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+        return requests / elapsed, statistics.median(latencies)
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from store.benchmarks.runner import (
+    ScenarioFailed, load_baselines, regressions, run_scenarios, save_baselines, uncovered_routes,
+)
+from store.benchmarks.scenarios import SCENARIOS
+from store.benchmarks.seed import seed_catalog
+
+BENCHMARK_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'store-benchmark'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон API на синтетическом каталоге во временной тестовой базе: '
+        'p50/p95/p99, SQL-запросы и размер ответа по каждому эндпоинту, '
+        'падает, если число запросов выросло относительно store/benchmarks/baselines.json'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--reviews', type=int, default=100000)
+        parser.add_argument('--carts', type=int, default=500)
+        parser.add_argument('--iterations', type=int, default=30, help='Запросов на сценарий')
+        parser.add_argument('--only', nargs='+', metavar='SCENARIO', help='Прогнать только указанные сценарии')
+        parser.add_argument('--update-baselines', action='store_true',
+                            help='Записать текущие числа запросов в baselines.json вместо проверки')
+
+    def handle(self, *args, **options):
+        scenarios = SCENARIOS
+        if options['only']:
+            unknown = set(options['only']) - {scenario.name for scenario in SCENARIOS}
+            if unknown:
+                raise CommandError(f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+            scenarios = [scenario for scenario in SCENARIOS if scenario.name in options['only']]
+
+        # Отдельная тестовая база и локальный кэш: рабочие данные и общий кэш не трогаем
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                self.stdout.write('Заполнение каталога...')
+                ctx = seed_catalog(
+                    books=options['books'], users=options['users'],
+                    reviews=options['reviews'], carts=options['carts'],
+                )
+                for name in uncovered_routes(SCENARIOS, ctx):
+                    self.stdout.write(self.style.WARNING(f'Маршрут {name} не покрыт сценариями'))
+                try:
+                    results = run_scenarios(scenarios, ctx, options['iterations'])
+                except ScenarioFailed as exc:
+                    raise CommandError(str(exc))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results)
+
+        if options['update_baselines']:
+            save_baselines(results)
+            self.stdout.write(self.style.SUCCESS('baselines.json обновлен'))
+            return
+
+        failed = regressions(results, load_baselines())
+        for name, queries, budget in failed:
+            self.stdout.write(self.style.ERROR(f'{name}: {queries} SQL-запросов при бюджете {budget}'))
+        if failed:
+            raise CommandError(f'Регрессия числа запросов в {len(failed)} сценариях')
+
+    def report(self, results):
+        self.stdout.write(f'{"scenario":<22}{"p50":>9}{"p95":>9}{"p99":>9}{"queries":>9}{"bytes":>9}')
+        for result in results:
+            self.stdout.write(
+                f'{result["name"]:<22}'
+                f'{result["p50"] * 1000:>7.2f}ms{result["p95"] * 1000:>7.2f}ms{result["p99"] * 1000:>7.2f}ms'
+                f'{result["queries"]:>9}{result["bytes"]:>9}'
+            )
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from store.caching import bump_generation
+from store.images import available_formats, process_book
+from store.models import Book
+
+
+class Command(BaseCommand):
+    help = 'Нарезает превью обложек (WebP/AVIF) для уже загруженных книг'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать превью, даже если они актуальны')
+        parser.add_argument('--workers', type=int, default=max(settings.COVER_RENDITION_WORKERS, 1))
+
+    def handle(self, *args, **options):
+        book_ids = list(Book.objects.exclude(image='').exclude(image__isnull=True).values_list('id', flat=True))
+
+        def process(book_id):
+            try:
+                return process_book(book_id, force=options['force'])
+            except Exception as exc:
+                self.stderr.write(f'Книга {book_id}: {exc}')
+                return False
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            processed = sum(pool.map(process, book_ids))
+
+        if processed:
+            bump_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f'Книг с обложками: {len(book_ids)}, обработано: {processed}, форматы: {", ".join(available_formats())}'
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие книги (косинусное сходство по покупкам, избранному и отзывам) '
+        'и сохраняет top-k соседей каждой книги для /api/books/<id>/similar/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=recommendations.TOP_K)
+        parser.add_argument('--batch-size', type=int, default=recommendations.BATCH_SIZE,
+                            help='Книг в одном умножении матриц (scipy) и строк в одной вставке')
+        parser.add_argument('--engine', choices=['scipy', 'python'],
+                            help='По умолчанию — scipy, если установлены NumPy и SciPy')
+
+    def handle(self, *args, **options):
+        if options['engine'] == 'scipy' and recommendations.sparse is None:
+            raise CommandError('Для --engine scipy установите numpy и scipy')
+        started = time.monotonic()
+        written = recommendations.build(options['top_k'], options['batch_size'], options['engine'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожие книги пересчитаны: {written} пар за {time.monotonic() - started:.1f} с'
+        ))
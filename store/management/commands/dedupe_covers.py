@@ -0,0 +1,61 @@
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from store.caching import bump_generation
+from store.images import has_local_image
+from store.models import Book
+from store.storage import cover_storage, is_content_addressed
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит уже загруженные обложки в контентно-адресуемое хранилище (имя = sha256 содержимого): '
+        'одинаковые файлы схлопываются, старые копии удаляются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-originals', action='store_true', help='Не удалять файлы со старыми именами')
+        parser.add_argument('--prune-orphans', action='store_true',
+                            help='Удалить из books/ файлы, на которые не ссылается ни одна книга (старые дубли загрузок)')
+
+    def handle(self, *args, **options):
+        old_names = set()
+        moved = 0
+        for book in Book.objects.only('id', 'image', 'cover_renditions').iterator():
+            if not has_local_image(book) or is_content_addressed(book.image.name):
+                continue
+            old_name = book.image.name
+            if not cover_storage.exists(old_name):
+                self.stderr.write(f'Книга {book.pk}: файл {old_name} не найден')
+                continue
+            with cover_storage.open(old_name) as f:
+                new_name = cover_storage.save(old_name, File(f))
+
+            renditions = book.cover_renditions
+            if renditions.get('source') == old_name:
+                # Превью уже названы по хэшу исходника и остаются валидными
+                renditions = {**renditions, 'source': new_name}
+            Book.objects.filter(pk=book.pk).update(image=new_name, cover_renditions=renditions)
+            old_names.add(old_name)
+            moved += 1
+
+        freed = 0
+        removed = 0
+        referenced = set(Book.objects.exclude(image='').values_list('image', flat=True))
+        to_remove = set() if options['keep_originals'] else old_names - referenced
+        if options['prune_orphans']:
+            upload_dir = Book._meta.get_field('image').upload_to.rstrip('/')
+            to_remove |= {f'{upload_dir}/{name}' for name in cover_storage.listdir(upload_dir)[1]} - referenced
+        for name in sorted(to_remove):
+            if cover_storage.exists(name):
+                freed += cover_storage.size(name)
+                cover_storage.delete(name)
+                removed += 1
+
+        if moved:
+            bump_generation()
+        unique = len(referenced)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено обложек: {moved}, уникальных файлов: {unique}, '
+            f'удалено старых: {removed} ({freed / 1024:.0f} КБ)'
+        ))
@@ -0,0 +1,99 @@
+import re
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from store.models import Favorite, Review
+from store.urls import router
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает план выполнения (EXPLAIN QUERY PLAN / EXPLAIN) для querysets всех вьюсетов '
+        'и основных путей доступа и помечает полные сканирования таблиц'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-on-scan', action='store_true', help='Код выхода 1, если найдено полное сканирование')
+        parser.add_argument('--verbose-plans', action='store_true', help='Печатать планы целиком, а не только проблемные')
+
+    def handle(self, *args, **options):
+        user = User.objects.order_by('id').first()
+        cases = list(self.viewset_cases(user)) + list(self.extra_cases(user))
+
+        flagged = 0
+        for name, queryset, allow_scan in cases:
+            plan = queryset.explain()
+            # Сортировка во временном B-дереве на пагинируемом списке — всегда ошибка:
+            # ORDER BY ... LIMIT должен идти по индексу, иначе каждая страница сортирует всю выборку
+            scans = [line for line in plan.splitlines() if self.is_full_scan(line) or self.is_temp_sort(line)]
+            if scans and allow_scan and not any(self.is_temp_sort(line) for line in scans):
+                self.stdout.write(f'[scan] {name} (список без фильтра и сортировки, сканирование ожидаемо)')
+            elif scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f'[SCAN] {name}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'[ OK ] {name}'))
+            if scans or options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f'        {line}')
+
+        self.stdout.write(f'Проверено запросов: {len(cases)}, с полным сканированием или сортировкой: {flagged}')
+        if flagged and options['fail_on_scan']:
+            raise CommandError('Найдены полные сканирования таблиц или сортировки во временном B-дереве')
+
+    def is_full_scan(self, line):
+        if connection.vendor == 'sqlite':
+            # "SCAN store_book" без индекса — полный проход по таблице
+            return bool(re.search(r'\bSCAN \S+', line)) and 'USING' not in line
+        return 'Seq Scan' in line
+
+    def is_temp_sort(self, line):
+        if connection.vendor == 'sqlite':
+            return 'USE TEMP B-TREE FOR ORDER BY' in line
+        return bool(re.search(r'\bSort\b', line)) and 'Incremental' not in line
+
+    def build_view(self, viewset, basename, user):
+        request = Request(APIRequestFactory().get('/'))
+        request.user = user or AnonymousUser()
+        return viewset(action='list', basename=basename, request=request, format_kwarg=None, kwargs={})
+
+    def filter_names(self, viewset):
+        # Фильтры django-filter: из filterset_class, если он задан, иначе из filterset_fields
+        filterset_class = getattr(viewset, 'filterset_class', None)
+        if filterset_class is not None:
+            return set(filterset_class.base_filters)
+        return set(getattr(viewset, 'filterset_fields', None) or [])
+
+    def viewset_cases(self, user):
+        for prefix, viewset, basename in router.registry:
+            if not hasattr(viewset, 'get_queryset'):
+                continue
+            view = self.build_view(viewset, basename, user)
+            try:
+                queryset = view.get_queryset()
+            except AssertionError:
+                # ViewSet без queryset (например, корзина) — пропускаем
+                continue
+            # Сканирование допустимо только для списка совсем без фильтра (каталог, категории);
+            # списки, отфильтрованные по пользователю, обязаны идти по индексу
+            yield f'{basename}-list', queryset, not queryset.query.where
+            filters = self.filter_names(viewset)
+            for field in getattr(viewset, 'ordering_fields', None) or []:
+                for ordering in (field, f'-{field}'):
+                    order = (ordering, 'id' if ordering == field else '-id')
+                    yield f'{basename}-list ordering={ordering}', queryset.order_by(*order), False
+                    if 'category' in filters:
+                        yield (
+                            f'{basename}-list category=1 ordering={ordering}',
+                            queryset.filter(category_id=1).order_by(*order),
+                            False,
+                        )
+
+    def extra_cases(self, user):
+        user_id = user.id if user else 0
+        yield 'book-reviews', Review.objects.filter(book_id=1).order_by('-created_at', '-id'), False
+        yield 'favorites-ids', Favorite.objects.filter(user_id=user_id).values_list('book_id', flat=True), False
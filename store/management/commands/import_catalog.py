@@ -0,0 +1,81 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importer import READERS, CatalogImporter
+
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Импорт каталога из CSV или JSONL (поля title, author, category, price, description, image, stock). '
+        'Пишет пакетами в отдельных транзакциях, после сбоя продолжает с --resume'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(READERS), help='По умолчанию — по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--skip-existing', action='store_true',
+                            help='Не обновлять уже существующие книги (по умолчанию обновляются)')
+        parser.add_argument('--resume', action='store_true', help='Продолжить с последнего сохраненного пакета')
+        parser.add_argument('--checkpoint', help='Файл прогресса (по умолчанию <path>.checkpoint)')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f'Файл {path} не найден')
+        fmt = options['format'] or path.suffix.lstrip('.').lower()
+        if fmt not in READERS:
+            raise CommandError(f'Неизвестный формат {fmt!r}, укажите --format')
+        checkpoint = Path(options['checkpoint'] or f'{path}.checkpoint')
+        source = {'source': str(path.resolve()), 'size': path.stat().st_size}
+
+        start = 0
+        index_pending = False
+        if options['resume'] and checkpoint.exists():
+            state = json.loads(checkpoint.read_text())
+            if {key: state.get(key) for key in source} != source:
+                raise CommandError(f'{checkpoint} записан для другого файла или файл изменился — продолжить нельзя')
+            start = state['rows']
+            # Старые файлы прогресса без флага: прошлые пакеты могли менять каталог — перестраиваем индекс
+            index_pending = state.get('index_pending', True)
+            self.stdout.write(f'Продолжаем со строки {start + 1}')
+
+        importer = CatalogImporter(
+            batch_size=options['batch_size'], update_existing=not options['skip_existing'], index_pending=index_pending,
+        )
+        started = time.perf_counter()
+        reported = [start]
+
+        def on_batch(processed):
+            # Прогресс пишется только после коммита пакета: при сбое повторится лишь незакоммиченный пакет
+            tmp = checkpoint.with_name(checkpoint.name + '.tmp')
+            tmp.write_text(json.dumps({**source, 'rows': processed, 'index_pending': importer.index_pending}))
+            os.replace(tmp, checkpoint)
+            if processed - reported[0] >= options['batch_size'] * 10:
+                reported[0] = processed
+                self.stdout.write(f'{processed} строк, {self.rate(processed - start, started):.0f} строк/с')
+
+        processed = importer.run(READERS[fmt](path), start=start, on_batch=on_batch)
+        importer.finish()
+        checkpoint.unlink(missing_ok=True)
+
+        for line, error in importer.errors[:MAX_REPORTED_ERRORS]:
+            self.stdout.write(self.style.WARNING(f'Строка {line}: {error}'))
+        if len(importer.errors) > MAX_REPORTED_ERRORS:
+            self.stdout.write(self.style.WARNING(f'...и еще {len(importer.errors) - MAX_REPORTED_ERRORS} ошибок'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {processed - start} за {time.perf_counter() - started:.1f}с '
+            f'({self.rate(processed - start, started):.0f} строк/с). '
+            f'Создано: {importer.created}, обновлено: {importer.updated}, '
+            f'пропущено дублей: {importer.skipped}, с ошибками: {len(importer.errors)}'
+        ))
+
+    def rate(self, rows, started):
+        return rows / max(time.perf_counter() - started, 1e-9)
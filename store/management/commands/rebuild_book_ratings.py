@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from store.caching import bump_generation
+from store.models import Book, Review
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает агрегаты рейтинга (количество, сумма, гистограмма) для всех книг'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        stats = {
+            row['book_id']: row
+            for row in Review.objects.order_by().values('book_id').annotate(
+                count=Count('id'),
+                total=Sum('rating'),
+                **{f'star_{star}': Count('id', filter=Q(rating=star)) for star in range(1, 6)},
+            )
+        }
+
+        updated = 0
+        with transaction.atomic():
+            batch = []
+            # Список id берем заранее: SQLite не изолирует курсор от bulk_update в той же таблице
+            for book_id in list(Book.objects.values_list('id', flat=True)):
+                row = stats.get(book_id)
+                book = Book(id=book_id)
+                book.reviews_count = row['count'] if row else 0
+                book.rating_sum = row['total'] if row else 0
+                for star in range(1, 6):
+                    setattr(book, f'rating_{star}', row[f'star_{star}'] if row else 0)
+                book.avg_rating = book.rating_sum / book.reviews_count if book.reviews_count else 0
+                batch.append(book)
+                if len(batch) >= batch_size:
+                    Book.objects.bulk_update(batch, Book.RATING_AGGREGATE_FIELDS)
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                Book.objects.bulk_update(batch, Book.RATING_AGGREGATE_FIELDS)
+                updated += len(batch)
+
+        bump_generation()
+        self.stdout.write(self.style.SUCCESS(f'Обновлено книг: {updated}'))
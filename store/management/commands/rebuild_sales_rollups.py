@@ -0,0 +1,34 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from store.analytics import rebuild_day
+from store.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает дневные сводки продаж из заказов — по одному дню в отдельной транзакции. '
+        'По умолчанию — с первого заказа по сегодняшний день'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', type=date.fromisoformat, help='ГГГГ-ММ-ДД')
+        parser.add_argument('--date-to', type=date.fromisoformat, help='ГГГГ-ММ-ДД')
+
+    def handle(self, *args, **options):
+        date_to = options['date_to'] or timezone.localdate()
+        date_from = options['date_from']
+        if date_from is None:
+            first = Order.objects.order_by('created_at').values_list('created_at', flat=True).first()
+            date_from = timezone.localdate(first) if first else date_to
+        if date_from > date_to:
+            raise CommandError('--date-from позже --date-to')
+
+        day, days = date_from, 0
+        while day <= date_to:
+            rebuild_day(day)
+            day += timedelta(days=1)
+            days += 1
+        self.stdout.write(self.style.SUCCESS(f'Сводки продаж пересчитаны: {date_from} — {date_to}, дней: {days}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.models import Book
+from store.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс книг'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            backend.rebuild(Book.objects.values_list('id', 'title', 'author').iterator())
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс ({backend.__class__.__name__}) перестроен, книг: {Book.objects.count()}'
+        ))
@@ -0,0 +1,313 @@
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('store.slow_requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SLOW_LOG_MAX_QUERIES = 50
+# Перехват SQL и Server-Timing — не на каждый запрос: по умолчанию на одном из двадцати
+DEFAULT_SAMPLE_RATE = 0.05
+# Метод попадает в метку как есть только из этого списка — иначе клиент раздует число временных рядов
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# Счетчики живут в отдельном словаре на каждый поток: запись идет без блокировок,
+# а /metrics складывает все шарды при чтении
+_local = threading.local()
+_shards = []
+# RequestTimings текущего сэмплированного запроса — для замера сериализаторов, которым request не передают
+_active_timings = ContextVar('store_metrics_timings', default=None)
+
+
+class RouteStats:
+    __slots__ = (
+        'statuses', 'latency_buckets', 'latency_sum', 'bytes_sum', 'sampled',
+        'query_buckets', 'queries_sum', 'db_sum', 'app_sum', 'serializer_sum', 'render_sum',
+    )
+
+    def __init__(self):
+        self.statuses = {}
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.bytes_sum = 0
+        self.sampled = 0
+        self.query_buckets = [0] * (len(QUERY_BUCKETS) + 1)
+        self.queries_sum = 0
+        self.db_sum = 0.0
+        self.app_sum = 0.0
+        self.serializer_sum = 0.0
+        self.render_sum = 0.0
+
+    def merge(self, other):
+        for status, count in list(other.statuses.items()):
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.latency_buckets = [a + b for a, b in zip(self.latency_buckets, other.latency_buckets)]
+        self.query_buckets = [a + b for a, b in zip(self.query_buckets, other.query_buckets)]
+        for name in (
+            'latency_sum', 'bytes_sum', 'sampled', 'queries_sum', 'db_sum', 'app_sum', 'serializer_sum', 'render_sum',
+        ):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+def _shard():
+    shard = getattr(_local, 'stats', None)
+    if shard is None:
+        shard = _local.stats = {}
+        _shards.append(shard)
+    return shard
+
+
+def record(route, method, status, duration, size, timings=None):
+    stats = _shard().get((route, method))
+    if stats is None:
+        stats = _shard()[(route, method)] = RouteStats()
+    stats.statuses[status] = stats.statuses.get(status, 0) + 1
+    stats.latency_buckets[bisect_left(LATENCY_BUCKETS, duration)] += 1
+    stats.latency_sum += duration
+    stats.bytes_sum += size
+    if timings is not None:
+        stats.sampled += 1
+        stats.query_buckets[bisect_left(QUERY_BUCKETS, timings.queries)] += 1
+        stats.queries_sum += timings.queries
+        stats.db_sum += timings.db
+        stats.app_sum += timings.app(duration)
+        stats.serializer_sum += timings.serializer
+        stats.render_sum += timings.render
+
+
+def snapshot():
+    merged = {}
+    for shard in list(_shards):
+        for key, stats in list(shard.items()):
+            merged.setdefault(key, RouteStats()).merge(stats)
+    return merged
+
+
+def reset():
+    for shard in list(_shards):
+        shard.clear()
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def _histogram(lines, name, buckets, counts, total, labels):
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+    cumulative += counts[-1]
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {cumulative}')
+    lines.append(f'{name}_sum{_labels(**labels)} {total}')
+    lines.append(f'{name}_count{_labels(**labels)} {cumulative}')
+
+
+def render_prometheus():
+    """Текстовый формат Prometheus (exposition format 0.0.4)."""
+    stats = sorted(snapshot().items())
+    lines = [
+        '# HELP store_requests_total Запросы по маршруту, методу и статусу',
+        '# TYPE store_requests_total counter',
+    ]
+    for (route, method), s in stats:
+        for status, count in sorted(s.statuses.items()):
+            lines.append(f'store_requests_total{_labels(route=route, method=method, status=status)} {count}')
+
+    lines += [
+        '# HELP store_request_duration_seconds Время обработки запроса',
+        '# TYPE store_request_duration_seconds histogram',
+    ]
+    for (route, method), s in stats:
+        _histogram(lines, 'store_request_duration_seconds', LATENCY_BUCKETS, s.latency_buckets, s.latency_sum,
+                   {'route': route, 'method': method})
+
+    lines += [
+        '# HELP store_db_queries_per_request SQL-запросов на запрос (только сэмплированные запросы)',
+        '# TYPE store_db_queries_per_request histogram',
+    ]
+    for (route, method), s in stats:
+        _histogram(lines, 'store_db_queries_per_request', QUERY_BUCKETS, s.query_buckets, s.queries_sum,
+                   {'route': route, 'method': method})
+
+    counters = [
+        ('store_response_bytes_total', 'Размер тел ответов', 'bytes_sum'),
+        ('store_sampled_requests_total', 'Запросы с разбивкой времени по фазам', 'sampled'),
+        ('store_db_seconds_total', 'Время в SQL (сэмплированные запросы)', 'db_sum'),
+        ('store_app_seconds_total', 'Время Python во вьюхах без SQL и сериализации (сэмплированные запросы)', 'app_sum'),
+        ('store_serializer_seconds_total', 'Время сериализаторов DRF без SQL (сэмплированные запросы)', 'serializer_sum'),
+        ('store_render_seconds_total', 'Время рендеринга ответа (сэмплированные запросы)', 'render_sum'),
+    ]
+    for name, help_text, attr in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (route, method), s in stats:
+            lines.append(f'{name}{_labels(route=route, method=method)} {getattr(s, attr)}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestTimings:
+    """execute_wrapper для всех баз: считает запросы и их время, для медленного лога запоминает SQL."""
+
+    def __init__(self, capture_sql=False):
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.render = 0.0
+        self.serializing = False
+        self.sql = [] if capture_sql else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db += duration
+            if self.sql is not None and len(self.sql) < SLOW_LOG_MAX_QUERIES:
+                self.sql.append((duration, sql))
+
+    def app(self, duration):
+        return max(duration - self.db - self.serializer - self.render, 0.0)
+
+    def server_timing(self, duration):
+        return (
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries", '
+            f'app;dur={self.app(duration) * 1000:.1f}, '
+            f'serialize;dur={self.serializer * 1000:.1f}, '
+            f'render;dur={self.render * 1000:.1f}, '
+            f'total;dur={duration * 1000:.1f}'
+        )
+
+
+def install_serializer_timing():
+    """
+    Оборачивает BaseSerializer.data: время построения представления (без SQL, который сериализатор
+    успел сделать по ходу) идёт в RequestTimings.serializer текущего сэмплированного запроса.
+    Вложенные сериализаторы не считаются повторно — замеряется только внешний .data.
+    """
+    from rest_framework.serializers import BaseSerializer
+
+    data = BaseSerializer.data.fget
+    if getattr(data, 'timed', False):
+        return
+
+    def timed_data(self):
+        timings = _active_timings.get()
+        if timings is None or timings.serializing:
+            return data(self)
+        timings.serializing = True
+        started, db = time.perf_counter(), timings.db
+        try:
+            return data(self)
+        finally:
+            timings.serializing = False
+            timings.serializer += max(time.perf_counter() - started - (timings.db - db), 0.0)
+
+    timed_data.timed = True
+    BaseSerializer.data = property(timed_data)
+
+
+class MetricsMiddleware:
+    """
+    Метрики по маршрутам для /metrics. Счетчик и гистограмма времени — на каждый запрос;
+    SQL и разбивка по фазам (плюс заголовок Server-Timing) — на доле STORE_METRICS['SAMPLE_RATE'].
+    Работает и в синхронном, и в асинхронном стеке: под ASGI не гоняет запрос через поток.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = getattr(settings, 'STORE_METRICS', {})
+        self.sample_rate = config.get('SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+        self.slow_request_ms = config.get('SLOW_REQUEST_MS')
+        self.server_timing = config.get('SERVER_TIMING', True)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = self.sample()
+        started = time.perf_counter()
+        token = _active_timings.set(timings)
+        try:
+            with self.capture(request, timings):
+                response = self.get_response(request)
+        finally:
+            _active_timings.reset(token)
+        return self.finish(request, response, time.perf_counter() - started, timings)
+
+    async def __acall__(self, request):
+        timings = self.sample()
+        started = time.perf_counter()
+        if timings is None:
+            response = await self.get_response(request)
+        else:
+            # Соединения с базой у каждого потока свои, а async ORM ходит в базу из потока sync_to_async —
+            # перехватчик ставим там же. Лишние переключения потоков — только у сэмплированных запросов
+            stack = await sync_to_async(self.capture)(request, timings)
+            token = _active_timings.set(timings)
+            try:
+                response = await self.get_response(request)
+            finally:
+                _active_timings.reset(token)
+                await sync_to_async(stack.close)()
+        return self.finish(request, response, time.perf_counter() - started, timings)
+
+    def sample(self):
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            return RequestTimings(capture_sql=bool(self.slow_request_ms))
+        return None
+
+    def capture(self, request, timings):
+        stack = ExitStack()
+        if timings is not None:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timings))
+            request._metrics_timings = timings
+        return stack
+
+    def finish(self, request, response, duration, timings):
+        match = request.resolver_match
+        route = match.url_name or match.view_name if match else 'unmatched'
+        size = len(response.content) if not response.streaming else 0
+        method = request.method if request.method in KNOWN_METHODS else 'OTHER'
+        record(route, method, response.status_code, duration, size, timings)
+
+        if timings is not None:
+            if self.server_timing:
+                response['Server-Timing'] = timings.server_timing(duration)
+            if self.slow_request_ms and duration * 1000 >= self.slow_request_ms:
+                self.log_slow_request(request, route, duration, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF-ответы рендерятся после вьюхи: засекаем рендер через post-render callback
+        timings = getattr(request, '_metrics_timings', None)
+        if timings is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                timings.render += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def log_slow_request(self, request, route, duration, timings):
+        statements = '\n'.join(f'  {sql_duration * 1000:.1f}ms {sql}' for sql_duration, sql in timings.sql)
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.0fms, %d SQL-запросов, %.0fms в базе\n%s',
+            request.method, request.get_full_path(), route, duration * 1000,
+            timings.queries, timings.db * 1000, statements,
+        )
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 11:35
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    CartItem = apps.get_model('store', 'CartItem')
+    duplicates = (
+        CartItem.objects.order_by().values('cart_id', 'book_id')
+        .annotate(rows=Count('id'), keep_id=Min('id'), quantity=Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        CartItem.objects.filter(pk=row['keep_id']).update(quantity=row['quantity'])
+        CartItem.objects.filter(cart_id=row['cart_id'], book_id=row['book_id']).exclude(pk=row['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_order_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'book'), name='unique_cart_book'),
+        ),
+    ]
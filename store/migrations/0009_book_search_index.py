@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 11:40
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5-индекс нужен только для SQLite, для Postgres поиск идет по tsvector
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS store_book_fts "
+        "USING fts5(title, author, tokenize='unicode61 remove_diacritics 2')"
+    )
+    Book = apps.get_model('store', 'Book')
+    for pk, title, author in Book.objects.values_list('id', 'title', 'author').iterator():
+        schema_editor.execute(
+            'INSERT INTO store_book_fts (rowid, title, author) VALUES (%s, %s, %s)',
+            [pk, title.lower().replace('ё', 'е'), author.lower().replace('ё', 'е')],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS store_book_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_cartitem_unique_cart_book'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 13:40
+
+import store.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_book_cover_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=store.storage.get_cover_storage, upload_to='books/', verbose_name='Обложка'),
+        ),
+    ]
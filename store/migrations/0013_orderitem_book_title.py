@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 16:10
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_book_titles(apps, schema_editor):
+    Book = apps.get_model('store', 'Book')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    OrderItem.objects.update(
+        book_title=Subquery(Book.objects.filter(pk=OuterRef('book_id')).values('title')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_book_image_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='book_title',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Название книги'),
+        ),
+        migrations.RunPython(fill_book_titles, migrations.RunPython.noop),
+    ]
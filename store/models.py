@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .storage import get_cover_storage
+
 class Category(models.Model):
     title = models.CharField(max_length=255, verbose_name="Название категории")
 
@@ -18,24 +20,69 @@ class Book(models.Model):
     author = models.CharField(max_length=255, verbose_name="Автор")
     description = models.TextField(verbose_name="Описание", blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена")
-    image = models.ImageField(upload_to='books/', blank=True, null=True, verbose_name="Обложка")
+    # Файлы обложек называются по хэшу содержимого, одинаковые загрузки хранятся один раз
+    image = models.ImageField(
+        upload_to='books/', storage=get_cover_storage, blank=True, null=True, verbose_name="Обложка"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата добавления")
     # Оставил одно поле stock (у тебя было два)
     stock = models.PositiveIntegerField(default=10, verbose_name="Количество на складе")
+    # Агрегаты по отзывам хранятся в самой книге, чтобы каталог не считал их на каждый запрос
+    reviews_count = models.PositiveIntegerField(default=0, verbose_name="Количество отзывов")
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name="Сумма оценок")
+    rating_1 = models.PositiveIntegerField(default=0, verbose_name="Оценок 1")
+    rating_2 = models.PositiveIntegerField(default=0, verbose_name="Оценок 2")
+    rating_3 = models.PositiveIntegerField(default=0, verbose_name="Оценок 3")
+    rating_4 = models.PositiveIntegerField(default=0, verbose_name="Оценок 4")
+    rating_5 = models.PositiveIntegerField(default=0, verbose_name="Оценок 5")
+    avg_rating = models.FloatField(default=0, verbose_name="Средний рейтинг")
+    # {'source': имя исходника, 'renditions': [{'name', 'format', 'width', 'height'}, ...]}, см. store.images
+    cover_renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Превью обложки")
+
+    RATING_AGGREGATE_FIELDS = [
+        'reviews_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5', 'avg_rating'
+    ]
 
     def __str__(self):
         return self.title
 
     @property
-    def avg_rating(self):
-        reviews = self.reviews.all()
-        if reviews.exists():
-            return sum([r.rating for r in reviews]) / reviews.count()
-        return 0
+    def rating_histogram(self):
+        return {star: getattr(self, f'rating_{star}') for star in range(5, 0, -1)}
+
+    @classmethod
+    def apply_review_rating(cls, book_id, rating, delta):
+        # delta = 1 при добавлении отзыва, -1 при удалении; вызывается внутри транзакции записи отзыва
+        cls.objects.filter(pk=book_id).update(**{
+            'reviews_count': models.F('reviews_count') + delta,
+            'rating_sum': models.F('rating_sum') + delta * rating,
+            f'rating_{rating}': models.F(f'rating_{rating}') + delta,
+        })
+        cls.objects.filter(pk=book_id).update(avg_rating=cls.avg_rating_expression())
+
+    @staticmethod
+    def avg_rating_expression():
+        return models.Case(
+            models.When(reviews_count=0, then=models.Value(0.0)),
+            default=models.ExpressionWrapper(
+                models.F('rating_sum') * 1.0 / models.F('reviews_count'), output_field=models.FloatField()
+            ),
+            output_field=models.FloatField(),
+        )
 
     class Meta:
         verbose_name = "Книга"
         verbose_name_plural = "Книги"
+        # Под сортировки и фильтр каталога; id в конце — стабильный порядок для keyset-пагинации
+        indexes = [
+            models.Index(fields=['price', 'id'], name='book_price_idx'),
+            models.Index(fields=['created_at', 'id'], name='book_created_idx'),
+            models.Index(fields=['avg_rating', 'id'], name='book_rating_idx'),
+            models.Index(fields=['category', 'price', 'id'], name='book_category_price_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], name='book_category_created_idx'),
+            models.Index(fields=['category', 'avg_rating', 'id'], name='book_category_rating_idx'),
+            models.Index(fields=['author', 'id'], name='book_author_idx'),
+        ]
 
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart', verbose_name="Пользователь")
@@ -48,6 +95,10 @@ class Cart(models.Model):
     def total_price(self):
         return sum([item.total_price for item in self.items.all()])
 
+    @property
+    def total_quantity(self):
+        return sum([item.quantity for item in self.items.all()])
+
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
@@ -60,6 +111,30 @@ class CartItem(models.Model):
     def total_price(self):
         return self.book.price * self.quantity
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'book'], name='unique_cart_book'),
+        ]
+
+class OrderQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # Смена статуса через update() (массовые действия в админке, bulk_update) обходит сигналы
+        # Order — сводки продаж переносятся здесь, по статусам до и после обновления
+        if 'status' not in kwargs:
+            return super().update(**kwargs)
+        from .analytics import record_status_change
+
+        with transaction.atomic(using=self.db):
+            before = {order.pk: order for order in self.only('id', 'status', 'total_price', 'created_at')}
+            updated = super().update(**kwargs)
+            after = Order.objects.filter(pk__in=before).values_list('id', 'status')
+            for pk, status in after:
+                order = before[pk]
+                if order.status != status:
+                    previous, order.status = order.status, status
+                    record_status_change(order, previous)
+        return updated
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('new', 'Новый'),
@@ -73,6 +148,10 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='new', verbose_name="Статус")
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Итоговая сумма")
+    # Ключ идемпотентности от клиента: повтор запроса с тем же ключом не создает второй заказ
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True, verbose_name="Ключ идемпотентности")
+
+    objects = OrderQuerySet.as_manager()
 
     def __str__(self):
         return f"Заказ #{self.id} от {self.user.username}"
@@ -80,16 +159,66 @@ class Order(models.Model):
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_order_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # Выгрузки и отчеты берут заказы за период по всем пользователям
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Название на момент оформления: история заказов не ходит в каталог и не меняется вместе с ним
+    book_title = models.CharField(max_length=255, blank=True, verbose_name="Название книги")
 
     def __str__(self):
-        return f"{self.book.title} в заказе #{self.order.id}"
+        return f"{self.book_title} в заказе #{self.order_id}"
     
+class DailyStatusSales(models.Model):
+    # Дневные сводки продаж (см. store.analytics): отчеты читают только их, а не историю заказов
+    date = models.DateField(verbose_name="Дата")
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, verbose_name="Статус")
+    orders_count = models.IntegerField(default=0, verbose_name="Заказов")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Сумма заказов")
+
+    class Meta:
+        verbose_name = "Заказы за день по статусу"
+        verbose_name_plural = "Заказы за день по статусам"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'status'], name='unique_daily_status_sales'),
+        ]
+
+class DailyBookSales(models.Model):
+    date = models.DateField(verbose_name="Дата")
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+', verbose_name="Книга")
+    units = models.IntegerField(default=0, verbose_name="Продано экземпляров")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Выручка")
+
+    class Meta:
+        verbose_name = "Продажи книги за день"
+        verbose_name_plural = "Продажи книг по дням"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'book'], name='unique_daily_book_sales'),
+        ]
+
+class DailyCategorySales(models.Model):
+    date = models.DateField(verbose_name="Дата")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+', verbose_name="Категория")
+    units = models.IntegerField(default=0, verbose_name="Продано экземпляров")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Выручка")
+
+    class Meta:
+        verbose_name = "Продажи категории за день"
+        verbose_name_plural = "Продажи категорий по дням"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='unique_daily_category_sales'),
+        ]
+
 class Review(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='reviews', verbose_name="Книга")
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Пользователь")
@@ -107,6 +236,9 @@ class Review(models.Model):
         verbose_name = "Отзыв"
         verbose_name_plural = "Отзывы"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['book', '-created_at', '-id'], name='review_book_created_idx'),
+        ]
 
 class Favorite(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorites', verbose_name="Пользователь")
@@ -116,4 +248,20 @@ class Favorite(models.Model):
     class Meta:
         unique_together = ('user', 'book')
         verbose_name = "Избранное"
-        verbose_name_plural = "Избранное"
\ No newline at end of file
+        verbose_name_plural = "Избранное"
+
+class BookSimilarity(models.Model):
+    # Соседи книги для рекомендаций, заранее посчитанные командой build_recommendations (см. store.recommendations)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+', verbose_name="Книга")
+    similar_book = models.ForeignKey(
+        Book, on_delete=models.CASCADE, related_name='similar_for', verbose_name="Похожая книга"
+    )
+    score = models.FloatField(verbose_name="Сходство")
+    rank = models.PositiveSmallIntegerField(verbose_name="Место")
+
+    class Meta:
+        verbose_name = "Похожая книга"
+        verbose_name_plural = "Похожие книги"
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'rank'], name='unique_book_similarity_rank'),
+        ]
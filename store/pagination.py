@@ -0,0 +1,174 @@
+import base64
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .caching import current_generation
+
+
+class ReviewCursorPagination(CursorPagination):
+    page_size = 10
+    ordering = ('-created_at', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        # Отзывы всегда идут от новых к старым, ?ordering= каталога книг к ним не относится
+        return self.ordering
+
+    def paginate_first_page(self, rows, base_url):
+        # Первая страница по уже загруженным page_size + 1 строкам (например, из async ORM)
+        self.base_url = base_url
+        self.cursor = None
+        self.has_previous = False
+        self.has_next = len(rows) > self.page_size
+        self.next_position = self._get_position_from_instance(rows[self.page_size], self.ordering) if self.has_next else None
+        self.page = list(rows[:self.page_size])
+        return self.page
+
+
+class OrderCursorPagination(CursorPagination):
+    # История заказов листается курсором по индексу (user, -created_at): без OFFSET и COUNT(*)
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    ordering = ('-created_at', '-id')
+
+
+class BookPagination(PageNumberPagination):
+    """
+    По умолчанию — обычные страницы (?page=), как раньше.
+    С ?pagination=keyset или ?cursor= включается keyset-режим: соседняя страница выбирается
+    условием WHERE по (поле сортировки, id), без OFFSET и без COUNT(*). Курсор ссылки previous
+    помечен 'r': страница читается в обратном порядке от первой строки текущей и разворачивается.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 60
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    count_cache_timeout = 60
+    # Поле сортировки в API -> разбор значения из курсора
+    keyset_fields = {
+        'price': Decimal,
+        'created_at': parse_datetime,
+        'average_rating': float,
+    }
+    default_keyset_ordering = '-created_at'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = (
+            request.query_params.get(self.mode_query_param) == 'keyset'
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = request.query_params.get('ordering', '').strip()
+        if ordering.lstrip('-') not in self.keyset_fields:
+            ordering = self.default_keyset_ordering
+        self.ordering = ordering
+        descending = ordering.startswith('-')
+        field = ordering.lstrip('-')
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = self.get_cached_count(queryset, request)
+
+        cursor = self.decode_cursor(request)
+        reverse = False
+        if cursor is not None:
+            if cursor['o'] != ordering:
+                raise NotFound('Курсор не соответствует сортировке')
+            try:
+                value = self.keyset_fields[field](cursor['v'])
+            except (TypeError, ValueError, InvalidOperation):
+                value = None
+            if value is None:
+                raise NotFound('Некорректный курсор')
+            reverse = bool(cursor.get('r'))
+            op = 'lt' if descending != reverse else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': cursor['id']})
+            )
+
+        order = ('-' + field, '-id') if descending != reverse else (field, 'id')
+        rows = list(queryset.order_by(*order)[:self.page_size + 1])
+        more = len(rows) > self.page_size
+        self.page_rows = rows[:self.page_size]
+        if reverse:
+            self.page_rows.reverse()
+            self.has_next, self.has_previous = True, more
+        else:
+            self.has_next, self.has_previous = more, cursor is not None
+        return self.page_rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+        if self.count is not None:
+            payload['count'] = self.count
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page_rows:
+            return None
+        return self.keyset_link(self.page_rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_rows:
+            return None
+        return self.keyset_link(self.page_rows[0], reverse=True)
+
+    def keyset_link(self, row, reverse):
+        value = getattr(row, self.ordering.lstrip('-'))
+        cursor = {'o': self.ordering, 'v': value if isinstance(value, float) else str(value), 'id': row.pk}
+        if reverse:
+            cursor['r'] = 1
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(cursor))
+
+    def encode_cursor(self, cursor):
+        return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if not isinstance(cursor, dict) or not {'o', 'v', 'id'} <= cursor.keys():
+                raise ValueError
+            # id уходит прямо в WHERE: строка или дробь из подделанного курсора иначе упала бы в базе с 500
+            if not isinstance(cursor['id'], int) or isinstance(cursor['id'], bool):
+                raise ValueError
+            return cursor
+        except (TypeError, ValueError):
+            raise NotFound('Некорректный курсор')
+
+    def get_cached_count(self, queryset, request):
+        # Счетчик зависит только от фильтров, поэтому курсор и размер страницы в ключ не входят
+        params = sorted(
+            (key, value) for key, value in request.query_params.lists()
+            if key not in (self.cursor_query_param, self.page_size_query_param, self.count_query_param, 'ordering')
+        )
+        key = f'store:books:count:{current_generation()}:' + hashlib.md5(json.dumps(params).encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
@@ -0,0 +1,127 @@
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import transaction
+
+from .analytics import EXCLUDED_STATUSES
+from .caching import bump_generation
+from .models import BookSimilarity, Favorite, OrderItem, Review
+
+# NumPy и SciPy есть в requirements.txt: сходство считается умножением разреженных матриц пачками книг.
+# Если их все же нет, работает тот же косинус на словарях — примерно вдвое медленнее
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+PURCHASE_WEIGHT = 3.0
+FAVORITE_WEIGHT = 2.0
+# Низкая оценка в отзыве разводит книги, высокая — сближает
+REVIEW_WEIGHTS = {1: -1.0, 2: -0.5, 3: 0.5, 4: 1.5, 5: 2.0}
+TOP_K = 20
+BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 5000
+
+
+def interactions():
+    """{(user_id, book_id): вес} по покупкам (без отмененных заказов), избранному и отзывам."""
+    weights = defaultdict(float)
+    purchases = (
+        OrderItem.objects.exclude(order__status__in=EXCLUDED_STATUSES)
+        .values_list('order__user_id', 'book_id').distinct().order_by()
+    )
+    for user_id, book_id in purchases.iterator(chunk_size=READ_CHUNK_SIZE):
+        weights[user_id, book_id] += PURCHASE_WEIGHT
+    favorites = Favorite.objects.values_list('user_id', 'book_id').order_by()
+    for user_id, book_id in favorites.iterator(chunk_size=READ_CHUNK_SIZE):
+        weights[user_id, book_id] += FAVORITE_WEIGHT
+    reviews = Review.objects.values_list('user_id', 'book_id', 'rating').order_by()
+    for user_id, book_id, rating in reviews.iterator(chunk_size=READ_CHUNK_SIZE):
+        weights[user_id, book_id] += REVIEW_WEIGHTS.get(rating, 0.0)
+    return {key: weight for key, weight in weights.items() if weight}
+
+
+def neighbors_sparse(weights, book_ids, top_k=TOP_K, batch_size=BATCH_SIZE):
+    """
+    Косинусное сходство столбцов матрицы пользователи × книги. Строки сходства считаются
+    пачками по batch_size книг: в памяти одновременно только batch_size × книг ненулевых значений.
+    """
+    user_index = {user_id: i for i, user_id in enumerate(sorted({user_id for user_id, _ in weights}))}
+    book_index = {book_id: i for i, book_id in enumerate(book_ids)}
+    rows = np.fromiter((user_index[user_id] for user_id, _ in weights), dtype=np.int64, count=len(weights))
+    cols = np.fromiter((book_index[book_id] for _, book_id in weights), dtype=np.int64, count=len(weights))
+    data = np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+    matrix = sparse.csc_matrix((data, (rows, cols)), shape=(len(user_index), len(book_ids)))
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    normalized = (matrix @ sparse.diags(1.0 / norms)).tocsc()
+    by_book = normalized.T.tocsr()
+
+    for start in range(0, len(book_ids), batch_size):
+        block = (by_book[start:start + batch_size] @ normalized).tocsr()
+        for offset in range(block.shape[0]):
+            lo, hi = block.indptr[offset], block.indptr[offset + 1]
+            columns, scores = block.indices[lo:hi], block.data[lo:hi]
+            keep = (columns != start + offset) & (scores > 0)
+            columns, scores = columns[keep], scores[keep]
+            # По убыванию сходства, при равенстве — по id книги (индексы столбцов идут в порядке id)
+            best = np.lexsort((columns, -scores))[:top_k]
+            yield book_ids[start + offset], [
+                (book_ids[column], float(score)) for column, score in zip(columns[best], scores[best])
+            ]
+
+
+def neighbors_python(weights, book_ids, top_k=TOP_K):
+    """То же, что neighbors_sparse, без NumPy/SciPy: скалярные произведения через общих пользователей."""
+    by_user, by_book, norms = defaultdict(list), defaultdict(list), defaultdict(float)
+    for (user_id, book_id), weight in weights.items():
+        by_user[user_id].append((book_id, weight))
+        by_book[book_id].append((user_id, weight))
+        norms[book_id] += weight * weight
+    norms = {book_id: math.sqrt(value) for book_id, value in norms.items()}
+
+    for book_id in book_ids:
+        dots = defaultdict(float)
+        for user_id, weight in by_book[book_id]:
+            for other_id, other_weight in by_user[user_id]:
+                if other_id != book_id:
+                    dots[other_id] += weight * other_weight
+        best = heapq.nsmallest(top_k, (
+            (-dot / (norms[book_id] * norms[other_id]), other_id) for other_id, dot in dots.items() if dot > 0
+        ))
+        yield book_id, [(other_id, -score) for score, other_id in best]
+
+
+def build(top_k=TOP_K, batch_size=BATCH_SIZE, engine=None):
+    """
+    Пересчитывает таблицу BookSimilarity целиком. engine: 'scipy', 'python' или None — SciPy, если установлена.
+    Возвращает число записанных пар.
+    """
+    if engine is None:
+        engine = 'python' if sparse is None else 'scipy'
+    weights = interactions()
+    book_ids = sorted({book_id for _, book_id in weights})
+    if engine == 'scipy':
+        neighbors = neighbors_sparse(weights, book_ids, top_k, batch_size)
+    else:
+        neighbors = neighbors_python(weights, book_ids, top_k)
+
+    # Сначала считаем все пары, и только потом открываем транзакцию: запись в SQLite блокирует
+    # остальных писателей (заказы, корзины, отзывы), поэтому под ней — только удаление и вставка
+    rows = [
+        (book_id, other_id, score, rank)
+        for book_id, similar in neighbors
+        for rank, (other_id, score) in enumerate(similar, 1)
+    ]
+    with transaction.atomic():
+        BookSimilarity.objects.all().delete()
+        for start in range(0, len(rows), batch_size):
+            BookSimilarity.objects.bulk_create([
+                BookSimilarity(book_id=book_id, similar_book_id=other_id, score=score, rank=rank)
+                for book_id, other_id, score, rank in rows[start:start + batch_size]
+            ])
+        transaction.on_commit(bump_generation)
+    return len(rows)
@@ -0,0 +1,136 @@
+import re
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Окончания для грубого стемминга русских слов: поиск идет по префиксу основы
+RUSSIAN_ENDINGS = sorted([
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ов', 'ев', 'ей', 'ой', 'ий', 'ый', 'ая', 'яя',
+    'ое', 'ее', 'ые', 'ие', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'а', 'я', 'ы', 'и', 'е', 'у', 'ю', 'о', 'ь',
+], key=len, reverse=True)
+CYRILLIC_RE = re.compile(r'[а-я]')
+
+
+def normalize_text(text):
+    return (text or '').lower().replace('ё', 'е')
+
+
+def stem(word):
+    if len(word) > 4 and CYRILLIC_RE.search(word):
+        for ending in RUSSIAN_ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= 3:
+                return word[:-len(ending)]
+    return word
+
+
+def query_terms(query):
+    return [stem(word) for word in WORD_RE.findall(normalize_text(query))]
+
+
+class BaseSearchBackend(ABC):
+    def index_book(self, book):
+        pass
+
+    def remove_book(self, book_id):
+        pass
+
+    def rebuild(self, books):
+        pass
+
+    @abstractmethod
+    def search(self, queryset, query):
+        """Сужает queryset книг до найденных по query."""
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    # Запасной вариант для СУБД без полнотекстового поиска: LIKE по каждому слову
+    def search(self, queryset, query):
+        for term in query_terms(query):
+            queryset = queryset.filter(Q(title__icontains=term) | Q(author__icontains=term))
+        return queryset
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    table = 'store_book_fts'
+
+    def index_book(self, book):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [book.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, author) VALUES (%s, %s, %s)',
+                [book.pk, normalize_text(book.title), normalize_text(book.author)],
+            )
+
+    def remove_book(self, book_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [book_id])
+
+    def rebuild(self, books):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, author) VALUES (%s, %s, %s)',
+                ((pk, normalize_text(title), normalize_text(author)) for pk, title, author in books),
+            )
+
+    def match_expression(self, query):
+        # Каждое слово — префиксный запрос в кавычках, чтобы спецсимволы FTS5 не ломали синтаксис
+        return ' '.join(f'"{term}"*' for term in query_terms(query))
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset
+        table = self.table
+        book_table = queryset.model._meta.db_table
+        # bm25 в FTS5 отрицательный: чем меньше, тем релевантнее; название весит больше автора
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT bm25({table}, 2.0, 1.0) FROM {table} WHERE {table} MATCH %s AND rowid = "{book_table}"."id"',
+                [match],
+            )
+        ).order_by('search_rank', 'pk')
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    # tsvector считается по таблице книг, отдельный индекс обновлять не нужно
+    config = 'russian'
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        terms = query_terms(query)
+        if not terms:
+            return queryset
+        vector = SearchVector('title', weight='A', config=self.config) + SearchVector('author', weight='B', config=self.config)
+        search_query = SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=self.config)
+        return queryset.annotate(search_document=vector).filter(search_document=search_query).annotate(
+            search_rank=SearchRank(vector, search_query)
+        ).order_by('-search_rank', 'pk')
+
+
+DEFAULT_BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'postgresql': PostgresSearchBackend,
+}
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'STORE_SEARCH_BACKEND', None)
+        if backend_path:
+            _backend = import_string(backend_path)()
+        else:
+            _backend = DEFAULT_BACKENDS.get(connection.vendor, SimpleSearchBackend)()
+    return _backend
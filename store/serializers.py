@@ -1,7 +1,13 @@
+from datetime import timedelta
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .images import srcset_data
 from .models import Category, Book, Cart, CartItem, Order, OrderItem, Review, Favorite
 
+SALES_REPORT_DEFAULT_DAYS = 30
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -20,16 +26,41 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'book', 'user', 'username', 'rating', 'text', 'created_at']
         read_only_fields = ['user', 'created_at']
 
+class CoverSrcsetField(serializers.ReadOnlyField):
+    def __init__(self, **kwargs):
+        super().__init__(source='cover_renditions', **kwargs)
+
+    def to_representation(self, value):
+        return srcset_data(value)
+
+class BookListSerializer(serializers.ModelSerializer):
+    image_srcset = CoverSrcsetField()
+
+    class Meta:
+        model = Book
+        fields = [
+            'id', 'category', 'title', 'author', 'price', 'image', 'image_srcset', 'stock', 'created_at',
+            'avg_rating', 'reviews_count',
+        ]
+
 class BookSerializer(serializers.ModelSerializer):
-    reviews = ReviewSerializer(many=True, read_only=True)
-    avg_rating = serializers.ReadOnlyField()
+    rating_histogram = serializers.ReadOnlyField()
+    image_srcset = CoverSrcsetField()
 
     class Meta:
         model = Book
-        fields = '__all__'
+        exclude = ['cover_renditions']
+        read_only_fields = Book.RATING_AGGREGATE_FIELDS
+
+class CartBookSerializer(serializers.ModelSerializer):
+    image_srcset = CoverSrcsetField()
+
+    class Meta:
+        model = Book
+        fields = ['id', 'title', 'author', 'price', 'image', 'image_srcset', 'stock']
 
 class CartItemSerializer(serializers.ModelSerializer):
-    book = BookSerializer(read_only=True)
+    book = CartBookSerializer(read_only=True)
     book_id = serializers.PrimaryKeyRelatedField(
         queryset=Book.objects.all(), source='book', write_only=True
     )
@@ -42,21 +73,113 @@ class CartItemSerializer(serializers.ModelSerializer):
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_price = serializers.ReadOnlyField()
+    total_quantity = serializers.ReadOnlyField()
 
     class Meta:
         model = Cart
-        fields = ['id', 'user', 'items', 'total_price']
+        fields = ['id', 'user', 'items', 'total_price', 'total_quantity']
 
-class OrderItemSerializer(serializers.ModelSerializer):
-    book_title = serializers.ReadOnlyField(source='book.title')
+class CartOperationSerializer(serializers.Serializer):
+    book_id = serializers.IntegerField()
+    delta = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        if ('delta' in attrs) == ('quantity' in attrs):
+            raise serializers.ValidationError('Укажите либо delta, либо quantity')
+        return attrs
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
+
+class BatchRequestSerializer(serializers.Serializer):
+    requests = serializers.ListField(
+        child=serializers.CharField(max_length=2000), allow_empty=False, max_length=20
+    )
 
+    def validate_requests(self, paths):
+        # Вложенные batch/bootstrap и потоковые ответы отсекает internal_get — статусом 400 у подзапроса
+        for path in paths:
+            if not path.startswith('/api/'):
+                raise serializers.ValidationError(f'Недопустимый путь: {path}')
+        return paths
+
+class OrderExportSerializer(serializers.Serializer):
+    format = serializers.ChoiceField(choices=['csv', 'jsonl'], default='csv')
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    status = serializers.ListField(
+        child=serializers.ChoiceField(choices=Order.STATUS_CHOICES), required=False
+    )
+
+    def validate(self, attrs):
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError('date_from позже date_to')
+        return attrs
+
+class SalesReportSerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    top = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate(self, attrs):
+        # По умолчанию — последние SALES_REPORT_DEFAULT_DAYS дней, включая сегодня
+        attrs.setdefault('date_to', timezone.localdate())
+        attrs.setdefault('date_from', attrs['date_to'] - timedelta(days=SALES_REPORT_DEFAULT_DAYS - 1))
+        if attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError('date_from позже date_to')
+        return attrs
+
+class SalesFiguresSerializer(serializers.Serializer):
+    orders = serializers.IntegerField(required=False)
+    units = serializers.IntegerField(required=False)
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+class SalesDaySerializer(SalesFiguresSerializer):
+    date = serializers.DateField()
+
+class SalesStatusSerializer(SalesFiguresSerializer):
+    status = serializers.CharField()
+    label = serializers.CharField()
+
+class SalesBookSerializer(SalesFiguresSerializer):
+    book_id = serializers.IntegerField()
+    title = serializers.CharField()
+
+class SalesCategorySerializer(SalesFiguresSerializer):
+    category_id = serializers.IntegerField()
+    title = serializers.CharField()
+
+class SalesReportResultSerializer(serializers.Serializer):
+    # Ответ store.analytics.sales_report: суммы строками, как DecimalField во всем API
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    totals = SalesFiguresSerializer()
+    days = SalesDaySerializer(many=True)
+    by_status = SalesStatusSerializer(many=True)
+    top_books = SalesBookSerializer(many=True)
+    categories = SalesCategorySerializer(many=True)
+
+class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
-        fields = ['book_title', 'quantity', 'price']
+        fields = ['book', 'book_title', 'quantity', 'price']
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
-        fields = ['id', 'user', 'status', 'total_price', 'created_at', 'items']
\ No newline at end of file
+        fields = ['id', 'user', 'status', 'total_price', 'created_at', 'items']
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    # Краткая запись для истории заказов: items_count приходит аннотацией из queryset
+    items_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'status', 'total_price', 'created_at', 'items_count']
+
+class OrderCreateSerializer(serializers.Serializer):
+    # Тело POST /api/orders/: ключ идемпотентности можно передать здесь или заголовком Idempotency-Key
+    idempotency_key = serializers.CharField(max_length=64, required=False, allow_blank=True)
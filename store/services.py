@@ -0,0 +1,169 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .analytics import record_order
+from .caching import bump_generation
+from .models import Book, CartItem, Order, OrderItem
+
+
+class InsufficientStock(Exception):
+    def __init__(self, shortages):
+        super().__init__('Недостаточно товара на складе')
+        self.shortages = shortages
+
+
+def _stock_shortages(cart_items, stock_by_book):
+    return [
+        {
+            'book_id': item.book_id,
+            'title': item.book.title,
+            'requested': item.quantity,
+            'available': stock_by_book[item.book_id],
+        }
+        for item in cart_items
+        if stock_by_book[item.book_id] < item.quantity
+    ]
+
+
+def place_order(user, idempotency_key=None):
+    """
+    Оформляет заказ из корзины пользователя одной транзакцией.
+    Возвращает (order, created); created=False, если заказ с этим ключом уже был создан
+    или корзина пуста (тогда order=None). При нехватке товара бросает InsufficientStock.
+    """
+    if idempotency_key:
+        existing = Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+        if existing:
+            return existing, False
+
+    try:
+        with transaction.atomic():
+            cart_items = list(
+                CartItem.objects.filter(cart__user=user)
+                .select_related('book')
+                .select_for_update(of=('self', 'book'))
+                .order_by('book_id')
+            )
+            if not cart_items:
+                return None, False
+
+            shortages = _stock_shortages(cart_items, {item.book_id: item.book.stock for item in cart_items})
+            if shortages:
+                raise InsufficientStock(shortages)
+
+            # Условное списание одним UPDATE: строка обновится, только если остатка хватает
+            requested = Case(
+                *[When(pk=item.book_id, then=Value(item.quantity)) for item in cart_items],
+            )
+            book_ids = [item.book_id for item in cart_items]
+            updated = Book.objects.filter(pk__in=book_ids, stock__gte=requested).update(stock=F('stock') - requested)
+            if updated != len(cart_items):
+                stock_by_book = dict(Book.objects.filter(pk__in=book_ids).values_list('id', 'stock'))
+                raise InsufficientStock(_stock_shortages(cart_items, stock_by_book))
+
+            order = Order.objects.create(
+                user=user,
+                status='new',
+                total_price=sum(item.book.price * item.quantity for item in cart_items),
+                idempotency_key=idempotency_key or None,
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order, book_id=item.book_id, quantity=item.quantity,
+                    price=item.book.price, book_title=item.book.title,
+                )
+                for item in cart_items
+            ])
+            record_order(order, [
+                (item.book_id, item.book.category_id, item.quantity, item.book.price) for item in cart_items
+            ])
+            CartItem.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+            # Остатки книг изменились через update(), сигналы не сработают — сбрасываем кэш каталога сами
+            transaction.on_commit(bump_generation)
+    except IntegrityError:
+        # Параллельный запрос с тем же ключом успел создать заказ первым
+        existing = Order.objects.filter(user=user, idempotency_key=idempotency_key).first() if idempotency_key else None
+        if existing is None:
+            # Ошибка целостности не связана с ключом идемпотентности — отдаём её как есть
+            raise
+        return existing, False
+
+    return order, True
+
+
+def collapse_cart_operations(operations):
+    """
+    Сворачивает список операций в одну на книгу, сохраняя порядок применения:
+    ('set', n) — итоговое количество известно, ('add', d) — сдвиг относительно текущего.
+    """
+    collapsed = {}
+    for op in operations:
+        book_id = op['book_id']
+        kind, value = collapsed.get(book_id, ('add', 0))
+        if 'quantity' in op:
+            kind, value = 'set', op['quantity']
+        elif kind == 'set':
+            value = max(value + op['delta'], 0)
+        else:
+            value += op['delta']
+        collapsed[book_id] = (kind, value)
+    return collapsed
+
+
+def apply_cart_operations(cart, operations):
+    """
+    Применяет пакет изменений корзины в одной транзакции.
+    Сдвиги обновляют существующие позиции через F(), явные количества и новые позиции — одним upsert.
+    Если у книги, количество которой выросло, не хватает остатка, транзакция откатывается с InsufficientStock;
+    уменьшать и удалять позиции можно всегда, даже если остаток уже меньше количества в корзине.
+    """
+    collapsed = collapse_cart_operations(operations)
+    with transaction.atomic():
+        existing = dict(
+            CartItem.objects.select_for_update()
+            .filter(cart=cart, book_id__in=collapsed)
+            .values_list('book_id', 'quantity')
+        )
+        increased = [
+            book_id for book_id, (kind, value) in collapsed.items()
+            if (value > 0 if kind == 'add' else value > existing.get(book_id, 0))
+        ]
+
+        deltas = {
+            book_id: value for book_id, (kind, value) in collapsed.items()
+            if kind == 'add' and book_id in existing and value
+        }
+        if deltas:
+            CartItem.objects.filter(cart=cart, book_id__in=deltas).update(
+                quantity=Greatest(
+                    F('quantity') + Case(*[When(book_id=book_id, then=Value(d)) for book_id, d in deltas.items()]),
+                    Value(0),
+                )
+            )
+
+        upserts = [
+            CartItem(cart=cart, book_id=book_id, quantity=value)
+            for book_id, (kind, value) in collapsed.items()
+            if value > 0 and (kind == 'set' or book_id not in existing)
+        ]
+        if upserts:
+            CartItem.objects.bulk_create(
+                upserts, update_conflicts=True, unique_fields=['cart', 'book'], update_fields=['quantity']
+            )
+
+        removed = [book_id for book_id, (kind, value) in collapsed.items() if kind == 'set' and value == 0]
+        CartItem.objects.filter(cart=cart, book_id__in=collapsed).filter(
+            Q(quantity=0) | Q(book_id__in=removed)
+        ).delete()
+
+        over_stock = (
+            CartItem.objects.filter(cart=cart, book_id__in=increased, quantity__gt=F('book__stock'))
+            .values_list('book_id', 'book__title', 'quantity', 'book__stock')
+        )
+        shortages = [
+            {'book_id': book_id, 'title': title, 'requested': quantity, 'available': stock}
+            for book_id, title, quantity, stock in over_stock
+        ]
+        if shortages:
+            raise InsufficientStock(shortages)
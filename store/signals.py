@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from . import analytics
+from .caching import bump_generation
+from .images import schedule_renditions
+from .models import Book, Category, Order, Review
+from .search import get_search_backend
+from . import suggest
+
+
+@receiver(pre_save, sender=Review)
+def review_before_save(sender, instance, **kwargs):
+    # Книга и оценка до правки (в админке можно сменить обе): вклад отзыва переносится в post_save
+    instance._previous_rating = None
+    if instance.pk and not kwargs.get('raw'):
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list('book_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    if created:
+        Book.apply_review_rating(instance.book_id, instance.rating, 1)
+        transaction.on_commit(bump_generation)
+    elif previous and previous != (instance.book_id, instance.rating):
+        Book.apply_review_rating(*previous, -1)
+        Book.apply_review_rating(instance.book_id, instance.rating, 1)
+        transaction.on_commit(bump_generation)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    Book.apply_review_rating(instance.book_id, instance.rating, -1)
+    transaction.on_commit(bump_generation)
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, **kwargs):
+    get_search_backend().index_book(instance)
+    schedule_renditions(instance)
+    transaction.on_commit(suggest.invalidate)
+    transaction.on_commit(bump_generation)
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    get_search_backend().remove_book(instance.pk)
+    transaction.on_commit(suggest.invalidate)
+    transaction.on_commit(bump_generation)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+    transaction.on_commit(bump_generation)
+
+
+@receiver(pre_save, sender=Order)
+def order_status_before_save(sender, instance, **kwargs):
+    # Статус до сохранения нужен, чтобы перенести заказ в сводках продаж; новые заказы учитывает place_order
+    instance._previous_status = None
+    if instance.pk and not kwargs.get('raw'):
+        instance._previous_status = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_status', None)
+    if not created and previous and previous != instance.status:
+        analytics.record_status_change(instance, previous)
@@ -19,6 +19,8 @@ let currentCategory = '';
 let currentUser = null; 
 let categoriesData = [];
 let currentPage = 1;
+// Фильтры каталога: внутри фасета варианты через ИЛИ, между фасетами — И (как в BookFilter)
+let facetFilters = { author: [], price_range: [], min_rating: '', in_stock: '' };
 let userFavorites = new Set(); 
 let bookModalInstance = null;
 
@@ -30,17 +32,21 @@ function getStarsHtml(rating) {
     return stars;
 }
 
+function applyCurrentUser(user) {
+    currentUser = user;
+    if(document.getElementById('profile-username')) {
+        document.getElementById('profile-username').value = currentUser.username;
+        document.getElementById('profile-email').value = currentUser.email || '';
+        document.getElementById('profile-firstname').value = currentUser.first_name || '';
+        document.getElementById('profile-lastname').value = currentUser.last_name || '';
+    }
+}
+
 async function fetchCurrentUser() {
     try {
         const response = await fetch('/api/profile/');
         if (response.ok) {
-            currentUser = await response.json();
-            if(document.getElementById('profile-username')) {
-                document.getElementById('profile-username').value = currentUser.username;
-                document.getElementById('profile-email').value = currentUser.email || '';
-                document.getElementById('profile-firstname').value = currentUser.first_name || '';
-                document.getElementById('profile-lastname').value = currentUser.last_name || '';
-            }
+            applyCurrentUser(await response.json());
             fetchUserFavorites();
         } else { currentUser = null; }
     } catch (e) { console.log('Пользователь не авторизован'); currentUser = null; }
@@ -150,6 +156,7 @@ function filterByCategory(catId) {
 function resetCatalog() {
     showCatalog();
     currentCategory = '';
+    facetFilters = { author: [], price_range: [], min_rating: '', in_stock: '' };
     const sInput = document.getElementById('search-input'); if(sInput) sInput.value = '';
     const sSelect = document.getElementById('sort-select'); if(sSelect) sSelect.value = '';
     renderCategoriesSidebar();
@@ -177,10 +184,22 @@ function applyFilters(overrideSearch, overrideSort) {
     loadBooks(searchVal, sortVal, 1);
 }
 
+// Обложка с превью из image_srcset: AVIF, затем WebP, оригинал — запасной вариант
+function coverHtml(book, className, sizes, placeholder) {
+    const fallback = book.image ? book.image : placeholder;
+    const cover = book.image_srcset;
+    if (!cover) return `<img src="${fallback}" class="${className}" loading="lazy" decoding="async">`;
+    const sources = ['avif', 'webp']
+        .filter(fmt => cover.sources[fmt])
+        .map(fmt => `<source type="image/${fmt}" srcset="${cover.sources[fmt]}" sizes="${sizes}">`)
+        .join('');
+    return `<picture>${sources}<img src="${fallback}" class="${className}" width="${cover.width}" height="${cover.height}" loading="lazy" decoding="async"></picture>`;
+}
+
 function renderBooksList(books, container) {
     container.innerHTML = ''; 
     books.forEach(book => {
-        const img = book.image ? book.image : 'https://via.placeholder.com/300x400';
+        const img = coverHtml(book, 'card-img-top', '(max-width: 576px) 50vw, 260px', 'https://via.placeholder.com/300x400');
         const stars = getStarsHtml(book.avg_rating);
         let stockHtml = '';
         if (book.stock > 5) stockHtml = `<span class="badge bg-success bg-opacity-10 text-success border border-success border-opacity-10 rounded-pill px-2">В наличии: ${book.stock}</span>`;
@@ -195,7 +214,7 @@ function renderBooksList(books, container) {
                          onclick="event.stopPropagation(); toggleFavorite(${book.id}, this.querySelector('i'))">
                         <i class="${heartIconClass} fs-5"></i>
                     </div>
-                    <img src="${img}" class="card-img-top">
+                    ${img}
                     <div class="card-body d-flex flex-column">
                         <div class="mb-2">
                             <h6 class="card-title text-dark fw-bold mb-1">${book.title}</h6>
@@ -224,29 +243,103 @@ async function loadBooks(search = '', ordering = '', page = 1) {
     container.innerHTML = '<div class="text-center w-100 py-5"><div class="spinner-border text-danger" role="status"></div></div>';
     let url = `/api/books/?page=${page}&search=${search}&ordering=${ordering}`;
     if (currentCategory && currentCategory !== 'favorites') url += `&category=${currentCategory}`;
+    url += facetQuery() + '&facets=1';
     try {
         const response = await fetch(url);
         if (!response.ok) throw new Error(`Ошибка: ${response.status}`);
-        const data = await response.json();
-        let books = [];
-        let totalCount = 0;
-        if (data.results) { books = data.results; totalCount = data.count; } 
-        else if (Array.isArray(data)) { books = data; totalCount = data.length; }
-        if (!books || books.length === 0) {
-            container.innerHTML = '<div class="col-12 text-center py-5"><h4>Ничего не найдено :(</h4></div>';
-            const pag = document.getElementById('pagination-container'); if(pag) pag.innerHTML = '';
-            return;
-        }
-        renderBooksList(books, container);
-        if (data.count !== undefined) { renderPagination(totalCount, page); } 
-        else { const pag = document.getElementById('pagination-container'); if(pag) pag.innerHTML = ''; }
-        currentPage = page;
+        renderBooksPage(await response.json(), page);
     } catch (e) { 
         console.error(e); 
         container.innerHTML = `<div class="col-12 text-center text-danger py-5"><p>Ошибка загрузки.</p></div>`;
     }
 }
 
+function renderBooksPage(data, page) {
+    const container = document.getElementById('books-container');
+    let books = [];
+    let totalCount = 0;
+    if (data.results) { books = data.results; totalCount = data.count; } 
+    else if (Array.isArray(data)) { books = data; totalCount = data.length; }
+    renderFacets(data.facets);
+    if (!books || books.length === 0) {
+        container.innerHTML = '<div class="col-12 text-center py-5"><h4>Ничего не найдено :(</h4></div>';
+        const pag = document.getElementById('pagination-container'); if(pag) pag.innerHTML = '';
+        return;
+    }
+    renderBooksList(books, container);
+    if (data.count !== undefined) { renderPagination(totalCount, page); } 
+    else { const pag = document.getElementById('pagination-container'); if(pag) pag.innerHTML = ''; }
+    currentPage = page;
+}
+
+function facetQuery() {
+    let query = '';
+    facetFilters.author.forEach(name => { query += `&author=${encodeURIComponent(name)}`; });
+    facetFilters.price_range.forEach(key => { query += `&price_range=${encodeURIComponent(key)}`; });
+    if (facetFilters.min_rating) query += `&min_rating=${facetFilters.min_rating}`;
+    if (facetFilters.in_stock) query += `&in_stock=${facetFilters.in_stock}`;
+    return query;
+}
+
+const priceRangeLabels = {
+    '0-300': 'до 300 ₽', '300-700': '300 – 700 ₽', '700-1500': '700 – 1500 ₽',
+    '1500-3000': '1500 – 3000 ₽', '3000-': 'от 3000 ₽',
+};
+
+function escapeHtml(value) {
+    return String(value).replace(/[&<>"']/g, ch => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' })[ch]);
+}
+
+// Счетчики приходят вместе со страницей (?facets=1): у каждого варианта — сколько книг будет, если его отметить
+function renderFacets(facets) {
+    const card = document.getElementById('facets-card');
+    const panel = document.getElementById('facets-panel');
+    if (!card || !panel) return;
+    if (!facets) { card.classList.add('d-none'); return; }
+    const option = (facet, value, label, count, checked) => `
+        <div class="form-check">
+            <input class="form-check-input" type="checkbox" ${checked ? 'checked' : ''} data-facet="${facet}" data-value="${escapeHtml(value)}" onchange="toggleFacet(this)">
+            <label class="form-check-label d-flex justify-content-between"><span>${escapeHtml(label)}</span><span class="text-muted">${count}</span></label>
+        </div>`;
+    let html = '<div class="fw-bold mb-1">Цена</div>';
+    facets.price_range.forEach(item => {
+        html += option('price_range', item.value, priceRangeLabels[item.value] || item.value, item.count, facetFilters.price_range.includes(item.value));
+    });
+    html += '<div class="fw-bold mt-3 mb-1">Рейтинг</div>';
+    facets.min_rating.forEach(item => {
+        html += option('min_rating', item.value, `от ${item.value} ★`, item.count, facetFilters.min_rating == item.value);
+    });
+    html += '<div class="fw-bold mt-3 mb-1">Наличие</div>';
+    facets.in_stock.forEach(item => {
+        html += option('in_stock', 'true', 'Только в наличии', item.count, facetFilters.in_stock === 'true');
+    });
+    if (facets.author.length) {
+        html += '<div class="fw-bold mt-3 mb-1">Автор</div>';
+        facets.author.forEach(item => {
+            html += option('author', item.value, item.value, item.count, facetFilters.author.includes(item.value));
+        });
+    }
+    panel.innerHTML = html;
+    card.classList.remove('d-none');
+}
+
+function toggleFacet(input) {
+    const facet = input.dataset.facet;
+    const value = input.dataset.value;
+    if (Array.isArray(facetFilters[facet])) {
+        const values = facetFilters[facet];
+        facetFilters[facet] = input.checked ? values.concat(value) : values.filter(v => v !== value);
+    } else {
+        facetFilters[facet] = input.checked ? value : '';
+    }
+    changePage(1);
+}
+
+function resetFacetFilters() {
+    facetFilters = { author: [], price_range: [], min_rating: '', in_stock: '' };
+    changePage(1);
+}
+
 function renderPagination(totalCount, currentPage) {
     const container = document.getElementById('pagination-container');
     if (!container) return;
@@ -280,22 +373,24 @@ function renderModalContent(book) {
     document.getElementById('modalBookAuthor').innerText = book.author;
     document.getElementById('modalBookDesc').innerText = book.description || 'Описание отсутствует.';
     document.getElementById('modalBookPrice').innerText = book.price;
-    document.getElementById('modalBookImage').src = book.image ? book.image : 'https://via.placeholder.com/300x400';
+    const modalImage = document.getElementById('modalBookImage');
+    modalImage.srcset = book.image_srcset ? (book.image_srcset.sources.webp || '') : '';
+    modalImage.sizes = '(max-width: 768px) 90vw, 400px';
+    modalImage.src = book.image ? book.image : 'https://via.placeholder.com/300x400';
     const stars = getStarsHtml(book.avg_rating);
     const stockText = book.stock > 0 ? `<span class="text-success">В наличии: ${book.stock}</span>` : '<span class="text-danger">Нет в наличии</span>';
     document.getElementById('modalBookRatingBlock').innerHTML = `<div class="d-flex align-items-center"><span class="fs-4 fw-bold me-2">${book.avg_rating.toFixed(1)}</span><div class="text-warning">${stars}</div></div><div class="mt-1 small">${stockText}</div>`;
     document.getElementById('modalAddToCartBtn').onclick = () => { increaseItem(book.id) };
     const reviews = book.reviews;
-    const totalReviews = reviews.length;
+    const totalReviews = book.reviews_count;
     document.getElementById('reviewsCount').innerText = totalReviews;
     document.getElementById('modalBigRating').innerText = book.avg_rating.toFixed(1);
     document.getElementById('modalBigStars').innerHTML = getStarsHtml(book.avg_rating);
-    const counts = {5: 0, 4: 0, 3: 0, 2: 0, 1: 0};
-    reviews.forEach(r => { if (counts[r.rating] !== undefined) counts[r.rating]++; });
+    const counts = book.rating_histogram;
     const barsContainer = document.getElementById('ratingBars');
     barsContainer.innerHTML = '';
     for (let star = 5; star >= 1; star--) {
-        const count = counts[star];
+        const count = counts[star] || 0;
         const percent = totalReviews > 0 ? (count / totalReviews) * 100 : 0;
         barsContainer.innerHTML += `<div class="d-flex align-items-center mb-1 small"><span class="me-2 text-muted" style="width: 10px;">${star}</span><i class="fas fa-star text-warning me-2" style="font-size: 0.7rem;"></i><div class="progress flex-grow-1" style="height: 6px;"><div class="progress-bar bg-warning" role="progressbar" style="width: ${percent}%"></div></div><span class="ms-2 text-muted" style="width: 20px; text-align: right;">${count}</span></div>`;
     }
@@ -304,30 +399,63 @@ function renderModalContent(book) {
     if (totalReviews === 0) {
         reviewsList.innerHTML = '<div class="text-center text-muted py-4"><i class="far fa-comment-dots fa-2x mb-2"></i><br>Нет отзывов. Станьте первым!</div>';
     } else {
-        reviews.forEach(review => {
-            const stars = getStarsHtml(review.rating);
-            const date = new Date(review.created_at).toLocaleDateString();
-            let deleteBtn = '';
-            if (currentUser && (currentUser.is_superuser || currentUser.username === review.username)) {
-                deleteBtn = `<button class="btn btn-sm btn-outline-danger ms-2" onclick="deleteReview(${review.id})" title="Удалить отзыв"><i class="fas fa-trash"></i></button>`;
-            }
-            reviewsList.innerHTML += `<div class="border-bottom pb-3 mb-3"><div class="d-flex justify-content-between align-items-center mb-1"><div><strong class="text-dark">${review.username}</strong><span class="badge bg-light text-dark border ms-2">${date}</span></div><div>${deleteBtn}</div></div><div class="mb-2 text-warning small">${stars}</div><p class="mb-0 text-secondary" style="font-size: 0.95rem; line-height: 1.5;">${review.text}</p></div>`;
-        });
+        appendReviews(reviews, book.reviews_next);
+    }
+}
+
+function appendReviews(reviews, nextUrl) {
+    const reviewsList = document.getElementById('reviewsList');
+    const moreBtn = document.getElementById('loadMoreReviewsBtn');
+    if (moreBtn) moreBtn.remove();
+    reviews.forEach(review => {
+        const stars = getStarsHtml(review.rating);
+        const date = new Date(review.created_at).toLocaleDateString();
+        let deleteBtn = '';
+        if (currentUser && (currentUser.is_superuser || currentUser.username === review.username)) {
+            deleteBtn = `<button class="btn btn-sm btn-outline-danger ms-2" onclick="deleteReview(${review.id})" title="Удалить отзыв"><i class="fas fa-trash"></i></button>`;
+        }
+        reviewsList.insertAdjacentHTML('beforeend', `<div class="border-bottom pb-3 mb-3"><div class="d-flex justify-content-between align-items-center mb-1"><div><strong class="text-dark">${review.username}</strong><span class="badge bg-light text-dark border ms-2">${date}</span></div><div>${deleteBtn}</div></div><div class="mb-2 text-warning small">${stars}</div><p class="mb-0 text-secondary" style="font-size: 0.95rem; line-height: 1.5;">${review.text}</p></div>`);
+    });
+    if (nextUrl) {
+        reviewsList.insertAdjacentHTML('beforeend', `<button id="loadMoreReviewsBtn" class="btn btn-sm btn-outline-secondary w-100" onclick="loadMoreReviews('${nextUrl}')">Показать еще отзывы</button>`);
     }
 }
 
+async function loadMoreReviews(url) {
+    try {
+        const response = await fetch(url);
+        const data = await response.json();
+        appendReviews(data.results, data.next);
+    } catch (e) { console.error(e); }
+}
+
 async function openBookDetails(id) {
     currentBookId = id;
     try {
         const response = await fetch(`/api/books/${id}/`);
         const book = await response.json();
         renderModalContent(book);
+        loadSimilarBooks(id);
         const modalEl = document.getElementById('bookDetailModal');
         if (!bookModalInstance) { bookModalInstance = new bootstrap.Modal(modalEl); }
         bookModalInstance.show();
     } catch (e) { console.error(e); }
 }
 
+// Похожие книги посчитаны на сервере заранее, здесь только показываем первые несколько
+async function loadSimilarBooks(id) {
+    const block = document.getElementById('similarBooksBlock');
+    block.style.display = 'none';
+    try {
+        const response = await fetch(`/api/books/${id}/similar/`);
+        if (!response.ok || id !== currentBookId) return;
+        const books = (await response.json()).slice(0, 4);
+        if (books.length === 0) return;
+        document.getElementById('similarBooksList').innerHTML = books.map(book => `<div class="col-6 col-md-3"><div class="card h-100 border-0 shadow-sm" style="cursor: pointer;" onclick="openBookDetails(${book.id})">${coverHtml(book, 'card-img-top', '(max-width: 768px) 45vw, 180px', 'https://via.placeholder.com/300x400')}<div class="card-body p-2"><div class="small fw-bold text-truncate">${book.title}</div><div class="small text-muted text-truncate">${book.author}</div><div class="small text-danger fw-bold">${book.price} ₽</div></div></div></div>`).join('');
+        block.style.display = 'block';
+    } catch (e) { console.error(e); }
+}
+
 async function refreshBookDetails() {
     if (!currentBookId) return;
     try {
@@ -375,114 +503,151 @@ async function loadCart() {
             container.innerHTML = '<div class="alert alert-light text-center py-5"><h4>Доступно авторизованным</h4>Пожалуйста, <a href="#" onclick="showLoginOverlay()" class="alert-link">войдите</a> в систему.</div>';
             return;
         }
-        const cart = await response.json();
-        container.innerHTML = '';
-        if (cart.items.length === 0) {
-            container.innerHTML = '<div class="text-center py-5 text-muted"><h4>Корзина пуста</h4><p>Добавьте книги из каталога</p></div>';
-            if(document.getElementById('cart-total')) document.getElementById('cart-total').innerText = '0';
-            updateCartCount();
-            return;
-        }
-        let html = '<div class="table-responsive"><table class="table align-middle"><thead><tr><th>Книга</th><th class="text-center">Кол-во</th><th>Цена</th><th></th></tr></thead><tbody>';
-        cart.items.forEach(item => {
-            const sum = (item.book.price * item.quantity).toFixed(2);
-            html += `<tr><td style="min-width: 200px;"><div class="d-flex align-items-center"><img src="${item.book.image || 'https://via.placeholder.com/50'}" style="width: 40px; height: 55px; object-fit: cover; margin-right: 10px; border-radius: 4px;"><div><div class="fw-bold">${item.book.title}</div><div class="small text-muted">${item.book.author}</div></div></div></td><td class="text-center" style="width: 140px;"><div class="input-group input-group-sm"><button class="btn btn-outline-secondary" onclick="reduceItem(${item.book.id})"><i class="fas fa-minus"></i></button><span class="form-control text-center bg-white">${item.quantity}</span><button class="btn btn-outline-secondary" onclick="increaseItem(${item.book.id})"><i class="fas fa-plus"></i></button></div></td><td class="fw-bold">${sum} ₽</td><td class="text-end"><button class="btn btn-sm text-danger" onclick="deleteItem(${item.book.id})" title="Удалить"><i class="fas fa-trash-alt"></i></button></td></tr>`;
-        });
-        html += '</tbody></table></div>';
-        container.innerHTML = html;
-        document.getElementById('cart-total').innerText = cart.total_price;
-        updateCartCount();
+        renderCart(await response.json());
     } catch (error) { console.error(error); }
 }
 
-async function increaseItem(bookId) {
+function renderCart(cart) {
+    const container = document.getElementById('cart-container');
+    const badge = document.getElementById('cart-count');
+    if (badge) badge.innerText = cart.total_quantity;
+    container.innerHTML = '';
+    if (cart.items.length === 0) {
+        container.innerHTML = '<div class="text-center py-5 text-muted"><h4>Корзина пуста</h4><p>Добавьте книги из каталога</p></div>';
+        if(document.getElementById('cart-total')) document.getElementById('cart-total').innerText = '0';
+        return;
+    }
+    let html = '<div class="table-responsive"><table class="table align-middle"><thead><tr><th>Книга</th><th class="text-center">Кол-во</th><th>Цена</th><th></th></tr></thead><tbody>';
+    cart.items.forEach(item => {
+        const sum = (item.book.price * item.quantity).toFixed(2);
+        html += `<tr><td style="min-width: 200px;"><div class="d-flex align-items-center"><img src="${item.book.image || 'https://via.placeholder.com/50'}" srcset="${item.book.image_srcset ? (item.book.image_srcset.sources.webp || '') : ''}" sizes="40px" style="width: 40px; height: 55px; object-fit: cover; margin-right: 10px; border-radius: 4px;"><div><div class="fw-bold">${item.book.title}</div><div class="small text-muted">${item.book.author}</div></div></div></td><td class="text-center" style="width: 140px;"><div class="input-group input-group-sm"><button class="btn btn-outline-secondary" onclick="reduceItem(${item.book.id})"><i class="fas fa-minus"></i></button><span class="form-control text-center bg-white">${item.quantity}</span><button class="btn btn-outline-secondary" onclick="increaseItem(${item.book.id})"><i class="fas fa-plus"></i></button></div></td><td class="fw-bold">${sum} ₽</td><td class="text-end"><button class="btn btn-sm text-danger" onclick="deleteItem(${item.book.id})" title="Удалить"><i class="fas fa-trash-alt"></i></button></td></tr>`;
+    });
+    html += '</tbody></table></div>';
+    container.innerHTML = html;
+    document.getElementById('cart-total').innerText = cart.total_price;
+}
+
+// Клики по корзине копятся и уходят одним запросом /api/cart/batch/, ответ сразу содержит новую корзину
+const pendingCartOps = new Map();
+let cartFlushTimer = null;
+
+function queueCartOp(bookId, op) {
+    const current = pendingCartOps.get(bookId);
+    if (op.quantity !== undefined || !current) { pendingCartOps.set(bookId, {...op}); }
+    else if (current.quantity !== undefined) { current.quantity = Math.max(current.quantity + op.delta, 0); }
+    else { current.delta += op.delta; }
+    clearTimeout(cartFlushTimer);
+    cartFlushTimer = setTimeout(flushCartOps, 250);
+}
+
+async function flushCartOps() {
+    const operations = [];
+    pendingCartOps.forEach((op, bookId) => {
+        if (op.quantity !== undefined || op.delta !== 0) operations.push({book_id: bookId, ...op});
+    });
+    pendingCartOps.clear();
+    if (operations.length === 0) return;
     try {
-        const response = await fetch('/api/cart/add/', {
+        const response = await fetch('/api/cart/batch/', {
             method: 'POST',
             headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrftoken},
-            body: JSON.stringify({ book_id: bookId })
+            body: JSON.stringify({ operations: operations })
         });
         if (response.ok) {
+            const cart = await response.json();
             const cartView = document.getElementById('cart-view');
-            if (cartView && cartView.style.display === 'block') { loadCart(); } 
-            else { updateCartCount(); }
+            if (cartView && cartView.style.display === 'block') { renderCart(cart); }
+            else { const badge = document.getElementById('cart-count'); if (badge) badge.innerText = cart.total_quantity; }
         } else if (response.status === 403) {
             showLoginOverlay();
+        } else if (response.status === 409) {
+            const data = await response.json();
+            const lines = data.items.map(i => `${i.title}: доступно ${i.available}`);
+            alert(`${data.error}\n${lines.join('\n')}`);
+            loadCart();
         }
     } catch (e) { console.error(e); }
 }
+
+function increaseItem(bookId) { queueCartOp(bookId, {delta: 1}); }
 const addToCart = increaseItem;
 
-async function reduceItem(bookId) {
-    try {
-        const response = await fetch('/api/cart/reduce_quantity/', {
-            method: 'POST',
-            headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrftoken},
-            body: JSON.stringify({ book_id: bookId })
-        });
-        if (response.ok) { loadCart(); updateCartCount(); }
-    } catch (error) { console.error(error); }
-}
+function reduceItem(bookId) { queueCartOp(bookId, {delta: -1}); }
 
-async function deleteItem(bookId) {
-    try {
-        const response = await fetch('/api/cart/delete_item/', {
-            method: 'POST',
-            headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrftoken},
-            body: JSON.stringify({ book_id: bookId })
-        });
-        if (response.ok) { loadCart(); updateCartCount(); }
-    } catch (error) { console.error(error); }
-}
+function deleteItem(bookId) { queueCartOp(bookId, {quantity: 0}); }
 
 async function updateCartCount() {
     try {
         const response = await fetch('/api/cart/');
         if (response.ok) {
             const cart = await response.json();
-            let count = 0;
-            cart.items.forEach(item => count += item.quantity);
             const badge = document.getElementById('cart-count');
-            if(badge) badge.innerText = count;
+            if(badge) badge.innerText = cart.total_quantity;
         }
     } catch (e) {}
 }
 
+// Один ключ на попытку оформления: повторный клик или ретрай не создаст второй заказ
+let checkoutIdempotencyKey = null;
+
 async function checkout() {
+    if (!checkoutIdempotencyKey) checkoutIdempotencyKey = crypto.randomUUID();
     try {
         const response = await fetch('/api/orders/', {
             method: 'POST',
-            headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrftoken},
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrftoken, 'Idempotency-Key': checkoutIdempotencyKey},
             body: JSON.stringify({})
         });
-        if (response.ok) { showOrders(); updateCartCount(); } 
+        if (response.ok) { checkoutIdempotencyKey = null; showOrders(); updateCartCount(); }
+        else if (response.status === 409) {
+            checkoutIdempotencyKey = null;
+            const data = await response.json();
+            const lines = data.items.map(i => `${i.title}: доступно ${i.available}, в корзине ${i.requested}`);
+            alert(`${data.error}\n${lines.join('\n')}`);
+            loadCart();
+        }
     } catch (error) { console.error(error); }
 }
 
-async function loadOrders() {
+async function loadOrders(url) {
     const container = document.getElementById('orders-container');
     try {
-        const response = await fetch('/api/orders/');
+        const response = await fetch(url || '/api/orders/');
         if (response.status === 403) return;
         const data = await response.json();
         const orders = data.results ? data.results : data;
-        container.innerHTML = '';
-        if (!orders || orders.length === 0) {
+        if (!url) container.innerHTML = '';
+        document.getElementById('loadMoreOrdersBtn')?.remove();
+        if (!url && (!orders || orders.length === 0)) {
             container.innerHTML = '<p class="text-muted">Вы еще ничего не заказывали.</p>';
             return;
         }
+        // Список приходит кратким: состав заказа подгружается по клику из /api/orders/{id}/
         orders.forEach(order => {
-            let itemsHtml = '';
-            order.items.forEach(item => {
-                itemsHtml += `<li>${item.book_title} <span class="text-muted">(x${item.quantity})</span> — ${item.price} ₽</li>`;
-            });
             const date = new Date(order.created_at).toLocaleDateString();
-            const orderCard = `<div class="card mb-3 border-0 shadow-sm"><div class="card-header bg-white fw-bold d-flex justify-content-between"><span>Заказ #${order.id} от ${date}</span><span class="badge bg-secondary">${order.status}</span></div><div class="card-body"><ul class="text-muted small mb-3">${itemsHtml}</ul><h5 class="text-end text-dark">Итого: ${order.total_price} ₽</h5></div></div>`;
-            container.innerHTML += orderCard;
+            const orderCard = `<div class="card mb-3 border-0 shadow-sm"><div class="card-header bg-white fw-bold d-flex justify-content-between"><span>Заказ #${order.id} от ${date}</span><span class="badge bg-secondary">${order.status}</span></div><div class="card-body"><button class="btn btn-link btn-sm p-0 mb-2" onclick="toggleOrderItems(${order.id})">Состав заказа (${order.items_count})</button><ul id="order-items-${order.id}" class="text-muted small mb-3" style="display: none;"></ul><h5 class="text-end text-dark">Итого: ${order.total_price} ₽</h5></div></div>`;
+            container.insertAdjacentHTML('beforeend', orderCard);
         });
+        if (data.next) {
+            container.insertAdjacentHTML('beforeend', `<button id="loadMoreOrdersBtn" class="btn btn-sm btn-outline-secondary w-100" onclick="loadOrders('${data.next}')">Показать еще заказы</button>`);
+        }
     } catch (error) { console.error(error); }
 }
 
+async function toggleOrderItems(orderId) {
+    const list = document.getElementById(`order-items-${orderId}`);
+    if (list.style.display === 'none' && !list.dataset.loaded) {
+        try {
+            const response = await fetch(`/api/orders/${orderId}/`);
+            if (!response.ok) return;
+            const order = await response.json();
+            list.innerHTML = order.items.map(item => `<li>${item.book_title} <span class="text-muted">(x${item.quantity})</span> — ${item.price} ₽</li>`).join('');
+            list.dataset.loaded = '1';
+        } catch (error) { console.error(error); return; }
+    }
+    list.style.display = list.style.display === 'none' ? 'block' : 'none';
+}
+
 async function saveProfile() {
     const data = {
         email: document.getElementById('profile-email').value,
@@ -597,7 +762,32 @@ function showCatalog(){ hideAll(); document.getElementById('catalog-view').style
 function showCart(){ hideAll(); document.getElementById('cart-view').style.display='block'; loadCart(); }
 function showOrders(){ hideAll(); document.getElementById('orders-view').style.display='block'; loadOrders(); }
 function showProfile(){ hideAll(); document.getElementById('profile-view').style.display='block'; } 
-function handleSearch(e){ if(e.key==='Enter') applyFilters(); }
+function handleSearch(e){
+    if(e.key==='Enter') { applyFilters(); return; }
+    clearTimeout(suggestTimer);
+    suggestTimer = setTimeout(loadSuggestions, 150);
+}
+
+let suggestTimer = null;
+
+async function loadSuggestions() {
+    const query = document.getElementById('search-input').value.trim();
+    const list = document.getElementById('search-suggestions');
+    if (!list) return;
+    if (query.length < 2) { list.innerHTML = ''; return; }
+    try {
+        const response = await fetch(`/api/books/suggest/?q=${encodeURIComponent(query)}`);
+        if (!response.ok) return;
+        const items = await response.json();
+        list.innerHTML = '';
+        items.forEach(item => {
+            const option = document.createElement('option');
+            option.value = item.title;
+            option.label = item.author;
+            list.appendChild(option);
+        });
+    } catch (e) { console.error(e); }
+}
 
 function hideAllOverlays() {
     const loginOverlay = document.getElementById('login-overlay');
@@ -666,7 +856,25 @@ if (registerForm) {
     });
 }
 
+// Данные, которые сервер встроил в страницу (см. store.views.bootstrap_json): рисуем сразу, без запросов к API
+function applyBootstrap(data) {
+    if (data.user) {
+        applyCurrentUser(data.user);
+        userFavorites = new Set(data.favorite_ids || []);
+    } else { currentUser = null; }
+    categoriesData = data.categories || [];
+    renderCategoriesSidebar();
+    if (data.books) { renderBooksPage(data.books, 1); } else { loadBooks(); }
+    const badge = document.getElementById('cart-count');
+    if (badge && data.cart) badge.innerText = data.cart.total_quantity;
+}
+
 document.addEventListener('DOMContentLoaded', async () => {
+    const bootstrapElement = document.getElementById('bootstrap-data');
+    if (bootstrapElement) {
+        applyBootstrap(JSON.parse(bootstrapElement.textContent));
+        return;
+    }
     await fetchCurrentUser(); 
     loadCategories(); 
     loadBooks(); 
@@ -0,0 +1,188 @@
+import gzip
+import json
+import mimetypes
+import os
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_header_parameters, quote_etag
+
+# Необязательные зависимости: без brotli не пишутся .br, без rjsmin JS не минифицируется
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.map', '.xml'}
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+STATIC_CACHE_CONTROL = 'public, max-age=60'
+
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+CSS_SPACE_RE = re.compile(r'\s+')
+CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*')
+CSS_COLON_RE = re.compile(r':\s+')
+
+
+def minify_css(text):
+    # Консервативно: комментарии, переводы строк, пробелы у {};,> и после «:»,
+    # но не перед ним — «a :hover» и «a:hover» в селекторах означают разное
+    text = CSS_COMMENT_RE.sub('', text)
+    text = CSS_SPACE_RE.sub(' ', text)
+    text = CSS_PUNCTUATION_RE.sub(r'\1', text)
+    text = CSS_COLON_RE.sub(':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify(name, content):
+    if name.endswith(('.min.css', '.min.js')):
+        return None
+    if name.endswith('.css'):
+        return minify_css(content)
+    if name.endswith('.js') and rjsmin is not None:
+        return rjsmin.jsmin(content)
+    return None
+
+
+def accepted_encodings(header):
+    """Accept-Encoding -> {кодировка: q}; «gzip;q=0» — явный отказ, а не согласие."""
+    accepted = {}
+    for part in header.split(','):
+        if not part.strip():
+            continue
+        coding, params = parse_header_parameters(part)
+        try:
+            quality = float(params.get('q', 1))
+        except ValueError:
+            quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic: CSS/JS минифицируются при копировании, затем ManifestStaticFilesStorage
+    добавляет хэш в имена, и для каждого итогового файла рядом пишутся .gz и .br.
+    """
+
+    def _save(self, name, content):
+        if os.path.splitext(name)[1] in ('.css', '.js'):
+            content.seek(0)
+            raw = content.read()
+            minified = minify(name, raw.decode('utf-8') if isinstance(raw, bytes) else raw)
+            content.seek(0)
+            if minified is not None:
+                content = ContentFile(minified.encode('utf-8'))
+        return super()._save(name, content)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted({*paths, *self.hashed_files.values()}):
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS or not self.exists(name):
+                continue
+            with self.open(name) as f:
+                data = f.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            self.write_variant(name + '.gz', gzip.compress(data, compresslevel=9, mtime=0), len(data))
+            if brotli is not None:
+                self.write_variant(name + '.br', brotli.compress(data), len(data))
+
+    def write_variant(self, name, data, original_size):
+        # Сжатая версия не нужна, если не дает выигрыша
+        if len(data) >= original_size:
+            return
+        if self.exists(name):
+            self.delete(name)
+        super()._save(name, ContentFile(data))
+
+
+class StaticFilesMiddleware:
+    """
+    Отдает файлы из STATIC_ROOT, выбирая заранее сжатый вариант по Accept-Encoding (.br, затем .gz).
+    Имена с хэшем из манифеста кэшируются браузером навсегда.
+    """
+
+    encodings = (('br', '.br'), ('gzip', '.gz'))
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = settings.STATIC_ROOT
+        self.immutable = self.load_hashed_names()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def load_hashed_names(self):
+        if not self.root:
+            return set()
+        manifest_path = os.path.join(self.root, ManifestStaticFilesStorage.manifest_name)
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                return set(json.load(f).get('paths', {}).values())
+        except (OSError, ValueError):
+            return set()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.serve_static(request)
+        if response is not None:
+            return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # stat и open файла — короткие вызовы, их не переносим в поток; само тело FileResponse отдает потоково
+        response = self.serve_static(request)
+        if response is not None:
+            return response
+        return await self.get_response(request)
+
+    def serve_static(self, request):
+        if self.root and request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix):
+            return self.serve(request, request.path[len(self.prefix):])
+        return None
+
+    def serve(self, request, name):
+        path = os.path.normpath(os.path.join(self.root, name))
+        if not path.startswith(os.path.join(os.path.normpath(self.root), '')) or not os.path.isfile(path):
+            return None
+
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        served_path, encoding, best = path, None, 0.0
+        for candidate, suffix in self.encodings:
+            # Наибольший q, при равенстве — порядок encodings; «*» покрывает не названные явно кодировки
+            quality = accepted.get(candidate, accepted.get('*', 0.0))
+            if quality > best and os.path.isfile(path + suffix):
+                served_path, encoding, best = path + suffix, candidate, quality
+
+        stat = os.stat(served_path)
+        etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            response = FileResponse(open(served_path, 'rb'), content_type=content_type)
+            # FileResponse подставляет имя файла с диска (с .gz/.br) — для статики заголовок не нужен
+            response.headers.pop('Content-Disposition', None)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        # Vary — и на несжатом ответе: иначе общий кэш отдаст его и тем, кто принимает br/gzip
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if name in self.immutable else STATIC_CACHE_CONTROL
+        return response
@@ -0,0 +1,49 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Имя файла, которое уже содержит хэш содержимого: обложки (sha256) и их превью (хэш-ширина)
+CONTENT_ADDRESSED_NAME_RE = re.compile(r'^[0-9a-f]{16,64}(-\d+w)?\.[a-z0-9]+$')
+
+
+def is_content_addressed(name):
+    return bool(CONTENT_ADDRESSED_NAME_RE.match(os.path.basename(name)))
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файлы называются по sha256 содержимого: одинаковые загрузки превращаются в один файл,
+    а содержимое по имени никогда не меняется — его можно кэшировать навсегда.
+    Загрузки хэшируются всегда, даже если имя похоже на хэш; готовое имя без пересчёта
+    принимается только от внутреннего кода (превью обложек) через hashed=True.
+    """
+
+    def save(self, name, content, max_length=None, hashed=False):
+        if not hashed:
+            ext = os.path.splitext(name)[1].lower()
+            name = os.path.join(os.path.dirname(name), f'{content_hash(content)}{ext}')
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+cover_storage = ContentAddressedStorage()
+
+
+def get_cover_storage():
+    return cover_storage
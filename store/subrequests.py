@@ -0,0 +1,52 @@
+import logging
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+# Заголовки исходного запроса, которые во внутренний запрос не переносятся:
+# условные (иначе вместо данных придет 304) и согласование формата (нужен JSON)
+DROPPED_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_ACCEPT', 'CONTENT_TYPE', 'CONTENT_LENGTH')
+# Эндпоинты, которые сами собирают подзапросы: вложенный batch/bootstrap не выполняется
+NESTED_ROUTES = ('api-batch', 'api-bootstrap')
+
+logger = logging.getLogger('django.request')
+
+
+def internal_get(request, path, query=''):
+    """
+    Выполняет GET к вьюхе этого же приложения без HTTP: тот же пользователь и сессия
+    (аутентификация уже пройдена), то же соединение с базой, тот же кэш ответов.
+    Возвращает (status, content) с телом JSON в байтах. Потоковые ответы (выгрузки) не поддерживаются — 400;
+    исключение во вьюхе превращается в 500 только для этого подзапроса.
+    """
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return 404, b'{"detail":"Not found."}'
+    if match.url_name in NESTED_ROUTES:
+        return 400, b'{"detail":"Nested batch requests are not allowed."}'
+
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = path
+    sub.META = {key: value for key, value in request.META.items() if key not in DROPPED_HEADERS}
+    sub.META.update({'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'HTTP_ACCEPT': 'application/json'})
+    sub.GET = QueryDict(query)
+    sub.COOKIES = request.COOKIES
+    sub.user = request.user
+    sub.session = getattr(request, 'session', None)
+    sub.resolver_match = match
+
+    view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+    try:
+        response = view(sub, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+    except Exception:
+        logger.exception('Internal Server Error in subrequest: %s', path)
+        return 500, b'{"detail":"Internal server error."}'
+    if response.streaming:
+        response.close()
+        return 400, b'{"detail":"Streaming responses are not supported here."}'
+    return response.status_code, response.content
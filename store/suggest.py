@@ -0,0 +1,90 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from .search import normalize_text
+
+VERSION_CACHE_KEY = 'store:suggest:version'
+# Как часто воркер сверяет свою копию индекса с общим счетчиком версий
+VERSION_CHECK_INTERVAL = 1.0
+
+# Приоритеты совпадений: начало названия, начало автора, слово внутри названия или автора
+TITLE_START, AUTHOR_START, INNER_WORD = 0, 1, 2
+
+
+class PrefixIndex:
+    """
+    Отдельный отсортированный список ключей на каждый приоритет. Проход по спискам в порядке
+    приоритета сразу дает совпадения в порядке ранжирования (приоритет, ключ, id), поэтому
+    просмотр останавливается на limit-й книге и ничего не отбрасывается до ранжирования —
+    даже для однобуквенного префикса, под который попадает пол-каталога.
+    """
+
+    def __init__(self, rows):
+        self.books = {}
+        tiers = ([], [], [])
+        for pk, title, author in rows:
+            self.books[pk] = {'id': pk, 'title': title, 'author': author}
+            for text, start_priority in ((normalize_text(title), TITLE_START), (normalize_text(author), AUTHOR_START)):
+                words = text.split()
+                for position in range(len(words)):
+                    priority = start_priority if position == 0 else INNER_WORD
+                    tiers[priority].append((' '.join(words[position:]), pk))
+        self.tiers = []
+        for entries in tiers:
+            entries.sort()
+            self.tiers.append(([key for key, pk in entries], entries))
+
+    def lookup(self, query, limit=10):
+        prefix = ' '.join(normalize_text(query).split())
+        if not prefix:
+            return []
+        found = {}
+        for keys, entries in self.tiers:
+            for position in range(bisect_left(keys, prefix), len(keys)):
+                if len(found) >= limit or not keys[position].startswith(prefix):
+                    break
+                found.setdefault(entries[position][1], None)
+        return [self.books[pk] for pk in found]
+
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+_checked_at = 0.0
+
+
+def current_version():
+    return cache.get(VERSION_CACHE_KEY, 0)
+
+
+def get_index():
+    global _index, _index_version, _checked_at
+    now = time.monotonic()
+    index = _index
+    if index is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return index
+    version = current_version()
+    with _lock:
+        if _index is None or _index_version != version:
+            from .models import Book
+
+            _index = PrefixIndex(Book.objects.values_list('id', 'title', 'author').iterator())
+            _index_version = version
+        _checked_at = now
+        return _index
+
+
+def invalidate():
+    global _index
+    # Общий счетчик сообщает остальным воркерам, что их копия устарела
+    cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+    cache.incr(VERSION_CACHE_KEY)
+    with _lock:
+        _index = None
+
+
+def suggest(query, limit=10):
+    return get_index().lookup(query, limit)
@@ -1 +1,602 @@
-from django.test import TestCase
\ No newline at end of file
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import warnings
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .benchmarks.runner import load_baselines, run_scenarios, uncovered_routes
+from .benchmarks.scenarios import SCENARIOS
+from .benchmarks.seed import seed_catalog
+from .management.commands.explain_queries import Command as ExplainQueriesCommand
+from . import facets, metrics
+from .caching import bump_generation
+from .analytics import rebuild_day
+from .models import (
+    Book, Cart, CartItem, Category, DailyBookSales, DailyCategorySales, DailyStatusSales, Order, OrderItem, Review,
+)
+from .filters import BookFilter
+from .services import InsufficientStock, place_order
+from .storage import ContentAddressedStorage
+from .suggest import PrefixIndex
+from .views import BookViewSet
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QueryBudgetTests(TestCase):
+    """
+    Быстрая версия manage.py benchmark: маленький каталог, те же сценарии
+    и те же бюджеты SQL-запросов из store/benchmarks/baselines.json.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed_catalog(books=60, users=5, reviews=300, carts=3, categories=3)
+
+    def test_every_route_has_scenario(self):
+        self.assertEqual(uncovered_routes(SCENARIOS, self.ctx), [])
+
+    def test_every_scenario_has_baseline(self):
+        self.assertEqual(sorted({scenario.name for scenario in SCENARIOS} - set(load_baselines())), [])
+
+    def test_query_counts_within_baselines(self):
+        baselines = load_baselines()
+        for result in run_scenarios(SCENARIOS, self.ctx, iterations=2):
+            with self.subTest(scenario=result['name']):
+                self.assertLessEqual(result['queries'], baselines[result['name']])
+
+
+class CartOperationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='x')
+        category = Category.objects.create(title='Проза')
+        cls.book = Book.objects.create(title='Книга', author='Автор', price=Decimal('100'), stock=5, category=category)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, *operations):
+        return self.client.post('/api/cart/batch/', {'operations': list(operations)}, format='json')
+
+    def test_increase_over_stock_is_rejected(self):
+        self.assertEqual(self.batch({'book_id': self.book.id, 'quantity': 5}).status_code, 200)
+        response = self.batch({'book_id': self.book.id, 'delta': 1})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(CartItem.objects.get(book=self.book).quantity, 5)
+
+    def test_decrease_allowed_when_stock_dropped(self):
+        self.batch({'book_id': self.book.id, 'quantity': 5})
+        Book.objects.filter(pk=self.book.pk).update(stock=2)
+        self.assertEqual(self.batch({'book_id': self.book.id, 'delta': -1}).status_code, 200)
+        self.assertEqual(CartItem.objects.get(book=self.book).quantity, 4)
+        self.assertEqual(self.batch({'book_id': self.book.id, 'quantity': 3}).status_code, 200)
+        self.assertEqual(self.batch({'book_id': self.book.id, 'quantity': 0}).status_code, 200)
+        self.assertFalse(CartItem.objects.filter(book=self.book).exists())
+
+    def test_legacy_add_upserts(self):
+        Cart.objects.create(user=self.user)
+        for expected in (1, 2):
+            response = self.client.post('/api/cart/add/', {'book_id': self.book.id}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['quantity'], expected)
+        self.assertEqual(CartItem.objects.filter(book=self.book).count(), 1)
+
+
+class PlaceOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('customer', password='x')
+        category = Category.objects.create(title='Поэзия')
+        cls.book = Book.objects.create(title='Стихи', author='Автор', price=Decimal('250'), stock=3, category=category)
+
+    def setUp(self):
+        self.cart = Cart.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_order_empties_cart_and_takes_stock(self):
+        CartItem.objects.create(cart=self.cart, book=self.book, quantity=2)
+        order, created = place_order(self.user)
+        self.assertTrue(created)
+        self.assertEqual(order.total_price, Decimal('500'))
+        self.assertEqual(list(order.items.values_list('book_title', 'quantity')), [('Стихи', 2)])
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 1)
+
+    def test_insufficient_stock(self):
+        CartItem.objects.create(cart=self.cart, book=self.book, quantity=4)
+        with self.assertRaises(InsufficientStock) as raised:
+            place_order(self.user)
+        self.assertEqual(raised.exception.shortages[0]['available'], 3)
+
+        response = self.client.post('/api/orders/', {}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['items'][0]['book_id'], self.book.id)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 4)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 3)
+
+    def test_idempotency_key_replays_order(self):
+        CartItem.objects.create(cart=self.cart, book=self.book, quantity=1)
+        first = self.client.post('/api/orders/', {}, format='json', HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(first.status_code, 201)
+        CartItem.objects.create(cart=self.cart, book=self.book, quantity=1)
+        replay = self.client.post('/api/orders/', {'idempotency_key': 'checkout-1'}, format='json')
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.data['id'], first.data['id'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 2)
+
+    def test_unrelated_integrity_error_is_reraised(self):
+        CartItem.objects.create(cart=self.cart, book=self.book, quantity=1)
+        with mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=IntegrityError('order_item')):
+            with self.assertRaisesMessage(IntegrityError, 'order_item'):
+                place_order(self.user, idempotency_key='checkout-2')
+        self.assertFalse(Order.objects.exists())
+
+    def test_invalid_body(self):
+        self.assertEqual(self.client.post('/api/orders/', [1, 2], format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/orders/', {'idempotency_key': 'x' * 65}, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/orders/', {}, format='json').status_code, 400)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(title='Детективы')
+        # Много одинаковых цен: порядок внутри них держится только на id
+        Book.objects.bulk_create([
+            Book(title=f'Детектив {i}', author='Автор', price=Decimal(100 + i % 3 * 50), category=category)
+            for i in range(23)
+        ])
+        cls.expected = list(Book.objects.order_by('-price', '-id').values_list('id', flat=True))
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([book['id'] for book in response.json()['results']])
+            url = response.json()[link]
+        return pages
+
+    def test_next_links_cover_catalog_once_in_order(self):
+        pages = self.walk('/api/books/?pagination=keyset&ordering=-price&page_size=5', 'next')
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+
+    def test_previous_links_return_same_pages(self):
+        url = '/api/books/?pagination=keyset&ordering=-price&page_size=5'
+        first = self.client.get(url).json()
+        self.assertIsNone(first['previous'])
+        forward = self.walk(url, 'next')
+        response = self.client.get(url)
+        while response.json()['next']:
+            response = self.client.get(response.json()['next'])
+        backward = self.walk(response.json()['previous'], 'previous')
+        self.assertEqual(list(reversed(backward)), forward[:-1])
+
+    def test_tampered_cursor(self):
+        for payload in ({'o': '-price', 'v': '100', 'id': 'abc'}, {'o': '-price', 'v': '100', 'id': 1.5}, [1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+            response = self.client.get(f'/api/books/?ordering=-price&cursor={cursor}')
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get('/api/books/?cursor=%%%').status_code, 404)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    ALLOWED_HOSTS=['shop.example', 'mirror.example'],
+)
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(title='Фэнтези')
+        Book.objects.bulk_create([
+            Book(title=f'Фэнтези {i}', author='Автор', price=Decimal('300'), category=category) for i in range(12)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, host='shop.example'):
+        return self.client.get(url, HTTP_HOST=host)
+
+    def test_hit_until_generation_bumped(self):
+        self.assertEqual(self.get('/api/categories/')['X-Cache'], 'MISS')
+        self.assertEqual(self.get('/api/categories/')['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(title='Новая')
+        response = self.get('/api/categories/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Новая', [item['title'] for item in response.json()])
+
+        self.get('/api/books/')
+        bump_generation()
+        self.assertEqual(self.get('/api/books/')['X-Cache'], 'MISS')
+
+    def test_hosts_cached_separately(self):
+        first = self.get('/api/books/?page_size=5')
+        second = self.get('/api/books/?page_size=5', host='mirror.example')
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertTrue(first.json()['next'].startswith('http://shop.example/'))
+        self.assertTrue(second.json()['next'].startswith('http://mirror.example/'))
+
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('manager', password='x')
+        Category.objects.create(title='Справочники')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def batch(self, *paths):
+        response = self.client.post('/api/batch/', {'requests': list(paths)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return {item['path']: item for item in json.loads(response.content)}
+
+    def test_nested_and_streaming_subrequests_rejected(self):
+        items = self.batch('/api/batch/', '/api/bootstrap/', '/api/export/orders/?format=csv', '/api/categories/')
+        self.assertEqual([items[path]['status'] for path in items], [400, 400, 400, 200])
+
+    def test_failing_subrequest_does_not_break_batch(self):
+        with mock.patch.object(BookViewSet, 'list', side_effect=RuntimeError('boom')), self.assertLogs('django.request'):
+            items = self.batch('/api/books/', '/api/categories/')
+        self.assertEqual(items['/api/books/']['status'], 500)
+        self.assertEqual(items['/api/categories/']['status'], 200)
+
+
+class ReviewRatingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='x')
+        category = Category.objects.create(title='Мемуары')
+        cls.first = Book.objects.create(title='Первая', author='Автор', price=Decimal('100'), category=category)
+        cls.second = Book.objects.create(title='Вторая', author='Автор', price=Decimal('100'), category=category)
+
+    def assertAggregates(self, book, ratings):
+        book.refresh_from_db()
+        self.assertEqual(book.reviews_count, len(ratings))
+        self.assertEqual(book.rating_sum, sum(ratings))
+        self.assertEqual([getattr(book, f'rating_{star}') for star in range(1, 6)], [ratings.count(s) for s in range(1, 6)])
+        self.assertAlmostEqual(book.avg_rating, sum(ratings) / len(ratings) if ratings else 0.0)
+
+    def test_edit_moves_rating(self):
+        review = Review.objects.create(book=self.first, user=self.user, rating=2, text='Так себе')
+        Review.objects.create(book=self.first, user=self.user, rating=5, text='Отлично')
+        self.assertAggregates(self.first, [2, 5])
+
+        review.rating = 4
+        review.save()
+        self.assertAggregates(self.first, [4, 5])
+
+        review.book = self.second
+        review.rating = 1
+        review.save()
+        self.assertAggregates(self.first, [5])
+        self.assertAggregates(self.second, [1])
+
+        review.text = 'Без смены оценки'
+        review.save()
+        review.delete()
+        self.assertAggregates(self.second, [])
+
+
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'shopper{i}', password='x') for i in range(4)]
+        categories = [Category.objects.create(title=title) for title in ('Наука', 'Искусство')]
+        cls.books = [
+            Book.objects.create(
+                title=f'Том {i}', author='Автор', price=Decimal(120 + 35 * i), stock=50, category=categories[i % 2]
+            )
+            for i in range(4)
+        ]
+
+    def place(self, user, quantities):
+        cart, created = Cart.objects.get_or_create(user=user)
+        for book, quantity in zip(self.books, quantities):
+            if quantity:
+                CartItem.objects.create(cart=cart, book=book, quantity=quantity)
+        order, created = place_order(user)
+        return order
+
+    def snapshot(self, day):
+        return (
+            sorted(DailyStatusSales.objects.filter(date=day).exclude(orders_count=0)
+                   .values_list('status', 'orders_count', 'revenue')),
+            sorted(DailyBookSales.objects.filter(date=day).exclude(units=0).values_list('book_id', 'units', 'revenue')),
+            sorted(DailyCategorySales.objects.filter(date=day).exclude(units=0)
+                   .values_list('category_id', 'units', 'revenue')),
+        )
+
+    def test_incremental_rollups_match_rebuild(self):
+        orders = [
+            self.place(user, quantities)
+            for user, quantities in zip(self.users, ([1, 2, 0, 0], [0, 1, 3, 0], [2, 0, 0, 1], [1, 1, 1, 1]))
+        ]
+        orders[0].status = 'shipped'
+        orders[0].save()
+        orders[1].status = 'cancelled'
+        orders[1].save()
+        # Массовые смены статуса мимо save(): отмена и ее снятие
+        Order.objects.filter(pk__in=[orders[2].pk, orders[3].pk]).update(status='cancelled')
+        Order.objects.filter(pk=orders[3].pk).update(status='processing')
+        Order.objects.bulk_update([Order(pk=orders[1].pk, status='completed')], ['status'])
+
+        day = timezone.localdate()
+        incremental = self.snapshot(day)
+        self.assertEqual(dict((s, c) for s, c, r in incremental[0]), {
+            'shipped': 1, 'completed': 1, 'cancelled': 1, 'processing': 1,
+        })
+        rebuild_day(day)
+        self.assertEqual(incremental, self.snapshot(day))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class FacetCountTests(TestCase):
+    COMBINATIONS = [
+        {},
+        {'price_range': ['300-700', '3000-'], 'in_stock': 'true'},
+        {'author': ['Автор 1', 'Автор 2'], 'min_rating': '3'},
+        {'price_range': ['0-300'], 'min_rating': '2', 'in_stock': 'false'},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [Category.objects.create(title=f'Раздел {i}') for i in range(3)]
+        prices = [Decimal(value) for value in ('99', '300', '450', '700', '1499.99', '2500', '3000', '5200')]
+        Book.objects.bulk_create([
+            Book(
+                title=f'Книга {i}', author=f'Автор {i % 4}', price=prices[i % len(prices)],
+                stock=i % 3, avg_rating=(i * 7 % 50) / 10, category=cls.categories[i % 3],
+            )
+            for i in range(90)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        facets._index = None
+
+    def count(self, params):
+        filterset = BookFilter(params, queryset=Book.objects.all())
+        self.assertTrue(filterset.is_valid(), filterset.errors)
+        return filterset.qs.count()
+
+    def test_counts_match_filter_querysets(self):
+        for combination in self.COMBINATIONS:
+            params = dict(combination, category=[str(self.categories[0].id), str(self.categories[1].id)])
+            with self.subTest(params=params):
+                query = '&'.join(
+                    f'{name}={value}' for name, values in params.items()
+                    for value in (values if isinstance(values, list) else [values])
+                )
+                data = self.client.get(f'/api/books/?facets=1&{query}').json()
+                counts = data['facets']
+                self.assertEqual(counts['total'], data['count'])
+                self.assertEqual(counts['total'], self.count(params))
+                # Счетчик варианта — все фильтры, кроме своего фасета, плюс сам вариант
+                for facet in ('category', 'author', 'price_range'):
+                    for option in counts[facet]:
+                        self.assertEqual(option['count'], self.count(dict(params, **{facet: [str(option['value'])]})))
+                for option in counts['min_rating']:
+                    self.assertEqual(option['count'], self.count(dict(params, min_rating=str(option['value']))))
+                self.assertEqual(counts['in_stock'][0]['count'], self.count(dict(params, in_stock='true')))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(title='Приключения')
+
+    def found(self, query):
+        return [book['id'] for book in self.client.get(f'/api/books/?search={query}').json()['results']]
+
+    def test_results_follow_saves_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book = Book.objects.create(title='Остров сокровищ', author='Стивенсон', price=Decimal('300'), category=self.category)
+        self.assertEqual(self.found('сокровища'), [book.id])
+        self.assertEqual(self.found('стивенсон'), [book.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.title = 'Черная стрела'
+            book.save()
+        self.assertEqual(self.found('сокровища'), [])
+        self.assertEqual(self.found('стрела'), [book.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertEqual(self.found('стрела'), [])
+
+
+class ExportStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('exporter', password='x')
+        category = Category.objects.create(title='Учебники')
+        book = Book.objects.create(title='Алгебра', author='Автор', price=Decimal('100'), stock=0, category=category)
+        orders = Order.objects.bulk_create([Order(user=cls.staff, total_price=Decimal('100')) for _ in range(1200)])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, book=book, book_title=book.title, quantity=1, price=book.price) for order in orders
+        ])
+
+    async def test_asgi_export_streams_chunks(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get('/api/export/orders/?format=csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response.is_async)
+        chunks = []
+        # Синхронный итератор под ASGI Django собирает списком и предупреждает об этом — здесь предупреждения быть не должно
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            async for chunk in response:
+                chunks.append(chunk)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b''.join(chunks).decode().count('Алгебра'), 1200)
+
+    def test_wsgi_export_stays_sync(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/export/orders/?format=jsonl')
+        self.assertFalse(response.is_async)
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 1200)
+
+
+class ExplainQueriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', password='x')
+
+    def case_names(self):
+        return [name for name, queryset, allow_scan in ExplainQueriesCommand().viewset_cases(self.user)]
+
+    def test_scan_allowed_only_for_unfiltered_lists(self):
+        allowed = {name: allow_scan for name, queryset, allow_scan in ExplainQueriesCommand().viewset_cases(self.user)}
+        self.assertTrue(allowed['book-list'])
+        self.assertFalse(allowed['orders-list'])
+
+    def test_orders_list_counts_items_without_temp_sort(self):
+        category = Category.objects.create(title='Поэзия')
+        book = Book.objects.create(title='Стихи', author='Автор', price=Decimal('50'), category=category)
+        filled, empty = Order.objects.bulk_create([Order(user=self.user, total_price=Decimal('100')) for _ in range(2)])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=filled, book=book, book_title=book.title, quantity=1, price=book.price) for _ in range(2)
+        ])
+        self.client.force_login(self.user)
+        counts = {order['id']: order['items_count'] for order in self.client.get('/api/orders/').json()['results']}
+        self.assertEqual(counts, {filled.id: 2, empty.id: 0})
+
+        queryset = next(queryset for name, queryset, allow_scan in ExplainQueriesCommand().viewset_cases(self.user)
+                        if name == 'orders-list')
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', queryset.explain())
+
+    def test_category_cases_follow_filterset_class(self):
+        names = self.case_names()
+        for ordering in ('price', '-price', 'created_at', '-created_at', 'average_rating', '-average_rating'):
+            self.assertIn(f'book-list category=1 ordering={ordering}', names)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = ContentAddressedStorage(location=directory.name)
+
+    def test_upload_named_like_hash_is_hashed(self):
+        taken = self.storage.save('books/cover.jpg', ContentFile(b'original'))
+        # Загрузка под чужим хэш-именем не должна ни подменить, ни «найти» существующий файл
+        forged = self.storage.save(taken, ContentFile(b'forged'))
+        self.assertNotEqual(forged, taken)
+        self.assertEqual(forged, f'books/{hashlib.sha256(b"forged").hexdigest()}.jpg')
+        with self.storage.open(taken) as f:
+            self.assertEqual(f.read(), b'original')
+
+    def test_rendition_keeps_given_name(self):
+        name = 'books/renditions/0123456789abcdef-160w.webp'
+        self.assertEqual(self.storage.save(name, ContentFile(b'preview'), hashed=True), name)
+
+
+@override_settings(STORE_METRICS={'SAMPLE_RATE': 1.0, 'TOKEN': 'scrape'})
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('watcher', password='x')
+        Order.objects.bulk_create([Order(user=cls.user, total_price=Decimal('100')) for _ in range(5)])
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_serializer_time_reported_separately(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/api/orders/')
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+
+        body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape').content.decode()
+        line = next(line for line in body.splitlines()
+                    if line.startswith('store_serializer_seconds_total{route="orders-list",method="GET"}'))
+        self.assertGreater(float(line.split()[-1]), 0)
+
+
+class PrefixIndexTests(TestCase):
+    def test_title_match_outranks_many_inner_word_matches(self):
+        # Сотни совпадений по второму слову автора идут по алфавиту раньше начала названия
+        rows = [(pk, f'Книга {pk}', 'Иван Аааа') for pk in range(1, 301)] + [(301, 'Азбука', 'Лев Толстой')]
+        index = PrefixIndex(rows)
+        self.assertEqual([book['id'] for book in index.lookup('а', limit=3)], [301, 1, 2])
+        self.assertEqual([book['id'] for book in index.lookup('ив', limit=2)], [1, 2])
+        self.assertEqual(index.lookup('ё'), [])
+
+
+class ImportResumeTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/catalog.csv'
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('title,author,category,price\nОблако,Автор,Поэзия,100\nЛуна,Автор,Поэзия,200\n')
+
+    def resume(self, **state):
+        source = {'source': os.path.realpath(self.path), 'size': os.path.getsize(self.path)}
+        with open(f'{self.path}.checkpoint', 'w') as f:
+            json.dump({**source, 'rows': 2, **state}, f)
+        with mock.patch('store.importer.call_command') as rebuild:
+            call_command('import_catalog', self.path, '--resume', stdout=StringIO())
+        return rebuild
+
+    def test_resume_rebuilds_index_left_pending_by_crashed_run(self):
+        # Оба пакета закоммичены прошлым запуском, который упал до перестроения индекса
+        rebuild = self.resume(index_pending=True)
+        rebuild.assert_called_once_with('rebuild_search_index', stdout=mock.ANY)
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+
+    def test_resume_without_pending_changes_skips_rebuild(self):
+        self.resume(index_pending=False).assert_not_called()
+
+
+class StaticCompressionTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for suffix, content in (('', b'plain'), ('.gz', b'gzip'), ('.br', b'brotli')):
+            with open(f'{directory.name}/app.js{suffix}', 'wb') as f:
+                f.write(content)
+        settings_override = override_settings(STATIC_ROOT=directory.name, STATIC_URL='/static/')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def fetch(self, accept_encoding):
+        response = self.client.get('/static/app.js', HTTP_ACCEPT_ENCODING=accept_encoding)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        return response.get('Content-Encoding'), b''.join(response.streaming_content)
+
+    def test_encoding_follows_q_values(self):
+        self.assertEqual(self.fetch('gzip, deflate, br'), ('br', b'brotli'))
+        self.assertEqual(self.fetch('gzip, br;q=0'), ('gzip', b'gzip'))
+        self.assertEqual(self.fetch('br;q=0.5, gzip;q=1.0'), ('gzip', b'gzip'))
+        self.assertEqual(self.fetch('*;q=0.1, br;q=0'), ('gzip', b'gzip'))
+        self.assertEqual(self.fetch('gzip;q=0, br;q=0'), (None, b'plain'))
+        self.assertEqual(self.fetch(''), (None, b'plain'))
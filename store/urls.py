@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'books', views.BookViewSet)
@@ -10,6 +10,10 @@ router.register(r'orders', views.OrderViewSet, basename='orders')
 
 urlpatterns = [
     path('api/', include(router.urls)),
+    path('api/bootstrap/', views.bootstrap, name='api-bootstrap'),
+    path('api/batch/', views.batch, name='api-batch'),
+    path('api/export/orders/', views.export_orders, name='orders-export'),
+    path('api/analytics/sales/', views.sales_report, name='sales-report'),
     path('api/login/', views.login_view, name='api_login'),
     path('api/register/', views.register_user, name='register'),
     path('logout/', views.logout_view, name='logout'),
@@ -19,5 +23,11 @@ urlpatterns = [
     path('api/favorites/toggle/', views.toggle_favorite, name='favorites-toggle'),
     path('api/reviews/', views.ReviewCreateView.as_view(), name='review-create'),
     path('api/reviews/<int:pk>/', views.ReviewDeleteView.as_view(), name='review-delete'),
+    path('api/async/books/', async_views.book_list, name='async-book-list'),
+    path('api/async/books/<int:pk>/', async_views.book_detail, name='async-book-detail'),
+    path('api/async/categories/', async_views.category_list, name='async-category-list'),
+    path('api/async/favorites/ids/', async_views.favorite_ids, name='async-favorites-ids'),
+    path('api/async/profile/', async_views.profile, name='async-profile'),
+    path('metrics', views.metrics, name='metrics'),
     path('', views.index, name='index'),
 ]
\ No newline at end of file
@@ -1,20 +1,74 @@
+import hashlib
+import json
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified, JsonResponse,
+)
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import logout, authenticate, login
 from django.contrib.auth.models import User
-from django.db.models import Avg
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.utils._os import safe_join
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.utils.safestring import mark_safe
 
 from rest_framework import viewsets, permissions, status, generics, filters
 from rest_framework.views import APIView
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.renderers import JSONRenderer
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import Book, Category, Cart, CartItem, Order, OrderItem, Review, Favorite
 from .serializers import (
-    BookSerializer, CategorySerializer, CartSerializer, 
-    OrderSerializer, UserSerializer, ReviewSerializer
+    BookSerializer, BookListSerializer, CategorySerializer, CartSerializer, CartBatchSerializer,
+    OrderSerializer, OrderSummarySerializer, OrderCreateSerializer, UserSerializer, ReviewSerializer,
+    BatchRequestSerializer, OrderExportSerializer, SalesReportSerializer, SalesReportResultSerializer,
 )
+from .analytics import sales_report as build_sales_report
+from .caching import cache_response
+from .exports import export_response, filter_orders
+from .facets import facet_counts
+from .filters import BookFilter, BookSearchFilter
+from .metrics import render_prometheus
+from .pagination import BookPagination, OrderCursorPagination, ReviewCursorPagination
+from .services import InsufficientStock, apply_cart_operations, place_order
+from .storage import is_content_addressed
+from .subrequests import internal_get
+from .suggest import suggest as suggest_books
+
+# Сколько последних отзывов встраивается в карточку книги, остальные — через /api/books/{id}/reviews/
+BOOK_DETAIL_REVIEWS_LIMIT = 5
+SUGGEST_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+# Данные, которые index встраивает в страницу: ключ в JSON → эндпоинт, который его отдает
+BOOTSTRAP_PARTS = {'books': '/api/books/', 'categories': '/api/categories/'}
+BOOTSTRAP_USER_PARTS = {'user': '/api/profile/', 'favorite_ids': '/api/favorites/ids/', 'cart': '/api/cart/'}
+JSON_SCRIPT_ESCAPES = {ord('<'): '\\u003C', ord('>'): '\\u003E', ord('&'): '\\u0026'}
+# Файлы с хэшем содержимого в имени не меняются никогда, остальные медиа кэшируем на час
+IMMUTABLE_MEDIA_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MEDIA_CACHE_CONTROL = 'public, max-age=3600'
+
+def etag_response(request, data):
+    # ETag по содержимому ответа: на повторный опрос с If-None-Match отдаем 304 без тела
+    etag = quote_etag(hashlib.md5(JSONRenderer().render(data)).hexdigest())
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = Response(status=304)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
@@ -22,15 +76,90 @@ class CategoryViewSet(viewsets.ModelViewSet):
     pagination_class = None
     permission_classes = [AllowAny]
 
+    @cache_response()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response()
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 class BookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.annotate(average_rating=Avg('reviews__rating')).all()
+    queryset = Book.objects.annotate(average_rating=F('avg_rating')).all()
     serializer_class = BookSerializer
     permission_classes = [AllowAny]
+    pagination_class = BookPagination
     
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
+    filter_backends = [BookSearchFilter, filters.OrderingFilter, DjangoFilterBackend]
     search_fields = ['title', 'author']
     ordering_fields = ['price', 'created_at', 'average_rating'] 
-    filterset_fields = ['category']
+    filterset_class = BookFilter
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return BookListSerializer
+        return BookSerializer
+
+    @cache_response()
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') in ('1', 'true'):
+            response.data['facets'] = self.get_facets(request)
+        return response
+
+    def get_facets(self, request):
+        # Счетчики вариантов — из битового индекса в памяти (store.facets), без COUNT на каждый вариант.
+        # Фильтры к этому моменту уже проверены в list(), здесь только разбираем их еще раз
+        filterset = BookFilter(request.query_params, queryset=Book.objects.none(), request=request)
+        filterset.is_valid()
+        search = BookSearchFilter()
+        restrict_ids = None
+        if request.query_params.get(search.search_param, '').strip():
+            found = search.filter_queryset(request, Book.objects.all(), self)
+            restrict_ids = found.order_by().values_list('id', flat=True)
+        return facet_counts(filterset.form.cleaned_data, restrict_ids)
+
+    @cache_response()
+    def retrieve(self, request, *args, **kwargs):
+        book = self.get_object()
+        data = self.get_serializer(book).data
+
+        paginator = ReviewCursorPagination()
+        paginator.page_size = BOOK_DETAIL_REVIEWS_LIMIT
+        reviews = paginator.paginate_queryset(book.reviews.select_related('user'), request, view=self)
+        # Ссылка на продолжение должна вести на эндпоинт отзывов, а не на карточку книги
+        paginator.base_url = request.build_absolute_uri(reverse('book-reviews', args=[book.pk]))
+        data['reviews'] = ReviewSerializer(reviews, many=True).data
+        data['reviews_next'] = paginator.get_next_link()
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        # Подсказки для поиска отвечают из памяти процесса, без обращения к базе
+        try:
+            limit = min(max(int(request.query_params.get('limit', SUGGEST_LIMIT)), 1), SUGGEST_MAX_LIMIT)
+        except ValueError:
+            limit = SUGGEST_LIMIT
+        return Response(suggest_books(request.query_params.get('q', ''), limit))
+
+    @action(detail=True, methods=['get'], pagination_class=None)
+    @cache_response()
+    def similar(self, request, pk=None):
+        # Соседи посчитаны заранее командой build_recommendations: один запрос по индексу (book, rank)
+        if not pk.isdigit():
+            raise Http404
+        books = list(Book.objects.filter(similar_for__book_id=pk).order_by('similar_for__rank'))
+        if not books:
+            get_object_or_404(Book, pk=pk)
+        return Response(BookListSerializer(books, many=True, context=self.get_serializer_context()).data)
+
+    @action(detail=True, methods=['get'], pagination_class=ReviewCursorPagination)
+    @cache_response()
+    def reviews(self, request, pk=None):
+        book = self.get_object()
+        page = self.paginate_queryset(book.reviews.select_related('user'))
+        serializer = ReviewSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 class CartViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
@@ -39,10 +168,32 @@ class CartViewSet(viewsets.ViewSet):
         cart, created = Cart.objects.get_or_create(user=request.user)
         return cart
 
+    def get_cart_with_items(self, request):
+        # Корзина, позиции и книги — два запроса, итоги считаются по уже загруженным позициям
+        items = CartItem.objects.select_related('book').order_by('id')
+        cart, created = Cart.objects.prefetch_related(Prefetch('items', queryset=items)).get_or_create(user=request.user)
+        return cart
+
     def list(self, request):
-        cart = self.get_cart(request)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        serializer = CartSerializer(self.get_cart_with_items(request))
+        return etag_response(request, serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data['operations']
+
+        book_ids = {op['book_id'] for op in operations}
+        missing = book_ids - set(Book.objects.filter(id__in=book_ids).values_list('id', flat=True))
+        if missing:
+            return Response({'error': 'book not found', 'book_ids': sorted(missing)}, status=404)
+
+        try:
+            apply_cart_operations(self.get_cart(request), operations)
+        except InsufficientStock as e:
+            return Response({"error": str(e), "items": e.shortages}, status=409)
+        return Response(CartSerializer(self.get_cart_with_items(request)).data)
 
     @action(detail=False, methods=['post'])
     def add(self, request):
@@ -51,11 +202,13 @@ class CartViewSet(viewsets.ViewSet):
         book = get_object_or_404(Book, id=book_id)
         
         cart = self.get_cart(request)
-        item, created = CartItem.objects.get_or_create(cart=cart, book=book)
-        if not created:
-            item.quantity += 1
-            item.save()
-        return Response({'status': 'added', 'quantity': item.quantity})
+        # Тот же upsert, что и в batch: параллельные добавления не упираются в уникальность (cart, book)
+        try:
+            apply_cart_operations(cart, [{'book_id': book.id, 'delta': 1}])
+        except InsufficientStock as e:
+            return Response({"error": str(e), "items": e.shortages}, status=409)
+        quantity = CartItem.objects.filter(cart=cart, book=book).values_list('quantity', flat=True).first()
+        return Response({'status': 'added', 'quantity': quantity})
 
     @action(detail=False, methods=['post'])
     def reduce_quantity(self, request):
@@ -64,8 +217,7 @@ class CartViewSet(viewsets.ViewSet):
         try:
             item = CartItem.objects.get(cart=cart, book_id=book_id)
             if item.quantity > 1:
-                item.quantity -= 1
-                item.save()
+                CartItem.objects.filter(pk=item.pk, quantity__gt=1).update(quantity=F('quantity') - 1)
             else:
                 item.delete()
         except CartItem.DoesNotExist: 
@@ -84,29 +236,47 @@ class CartViewSet(viewsets.ViewSet):
         return Response({'status': 'deleted'})
 
 class OrderViewSet(viewsets.ModelViewSet):
+    """
+    Список — краткие записи (без состава) постранично по курсору; состав заказа — в детальном ответе
+    или в списке с ?expand=items. Названия книг хранятся в OrderItem, каталог не запрашивается.
+    """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = OrderSerializer
-    pagination_class = None
+    pagination_class = OrderCursorPagination
+
+    def with_items(self):
+        return self.action != 'list' or self.request.query_params.get('expand') == 'items'
+
+    def get_serializer_class(self):
+        return OrderSerializer if self.with_items() else OrderSummarySerializer
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        queryset = Order.objects.filter(user=self.request.user).order_by('-created_at', '-id')
+        if self.with_items():
+            return queryset.prefetch_related(Prefetch('items', queryset=OrderItem.objects.order_by('id')))
+        # Коррелированный подзапрос вместо annotate(Count('items')): без GROUP BY порядок
+        # ORDER BY created_at, id ... LIMIT берётся из индекса (user, -created_at), а не из временного B-дерева
+        items_count = (
+            OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+            .annotate(count=Count('id')).values('count')
+        )
+        return queryset.annotate(items_count=Coalesce(Subquery(items_count, output_field=IntegerField()), 0))
 
     def create(self, request, *args, **kwargs):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        if not cart.items.exists():
+        serializer = OrderCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        idempotency_key = request.headers.get('Idempotency-Key') or serializer.validated_data.get('idempotency_key')
+        if idempotency_key and len(idempotency_key) > 64:
+            return Response({"error": "Idempotency key is too long"}, status=400)
+
+        try:
+            order, created = place_order(request.user, idempotency_key)
+        except InsufficientStock as e:
+            return Response({"error": str(e), "items": e.shortages}, status=409)
+
+        if order is None:
             return Response({"error": "Empty cart"}, status=400)
-        
-        order = Order.objects.create(user=request.user, status='new', total_price=cart.total_price)
-        for item in cart.items.all():
-            OrderItem.objects.create(
-                order=order, book=item.book, quantity=item.quantity, price=item.book.price
-            )
-            if item.book.stock >= item.quantity:
-                item.book.stock -= item.quantity
-                item.book.save()
-
-        cart.items.all().delete()
-        return Response(self.get_serializer(order).data, status=201)
+        return Response(self.get_serializer(order).data, status=201 if created else 200)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -154,7 +324,7 @@ class UserProfileView(APIView):
         return Response(serializer.errors, status=400)
 
 class FavoriteListView(generics.ListAPIView):
-    serializer_class = BookSerializer
+    serializer_class = BookListSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -186,7 +356,9 @@ class ReviewCreateView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # Агрегаты рейтинга книги обновляются сигналом в той же транзакции
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
 
 class ReviewDeleteView(generics.DestroyAPIView):
     queryset = Review.objects.all()
@@ -198,5 +370,116 @@ class ReviewDeleteView(generics.DestroyAPIView):
             return Review.objects.all()
         return Review.objects.filter(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
+def bootstrap_json(request):
+    # Ответы API склеиваются в один JSON как есть, без повторной сериализации;
+    # <, > и & экранируются так же, как в json_script, чтобы текст не закрыл <script>
+    parts = dict(BOOTSTRAP_PARTS)
+    if request.user.is_authenticated:
+        parts.update(BOOTSTRAP_USER_PARTS)
+    chunks = []
+    for name, path in parts.items():
+        status, content = internal_get(request, path)
+        chunks.append(f'"{name}":{content.decode() if status == 200 else "null"}')
+    return ('{' + ','.join(chunks) + '}').translate(JSON_SCRIPT_ESCAPES)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def bootstrap(request):
+    # То же, что index встраивает в страницу, — для клиентов без HTML-оболочки
+    response = HttpResponse(bootstrap_json(request), content_type='application/json')
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def batch(request):
+    """
+    Несколько GET к API за один запрос: {"requests": ["/api/cart/", "/api/orders/", ...]}.
+    Подзапросы идут в этом же процессе с уже проверенным пользователем, права проверяет каждая вьюха,
+    анонимный каталог берется из кэша ответов. Ответ: [{"path", "status", "body"}, ...].
+    """
+    serializer = BatchRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    chunks = []
+    for full_path in serializer.validated_data['requests']:
+        path, _, query = full_path.partition('?')
+        status_code, content = internal_get(request, path, query)
+        chunks.append(f'{{"path":{json.dumps(full_path)},"status":{status_code},"body":{content.decode() or "null"}}}')
+    return HttpResponse('[' + ','.join(chunks) + ']', content_type='application/json')
+
 def index(request):
-    return render(request, 'store/index.html')
\ No newline at end of file
+    if not settings.STORE_SSR_BOOTSTRAP:
+        return render(request, 'store/index.html')
+    # Первая страница каталога, категории, а для вошедших — профиль, избранное и корзина
+    # приходят прямо в HTML, и SPA рисует каталог без пяти запросов к API подряд
+    response = render(request, 'store/index.html', {'bootstrap_json': mark_safe(bootstrap_json(request))})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+def metrics(request):
+    # Prometheus ходит с токеном из STORE_METRICS['TOKEN'], сотрудники — со своей сессией
+    token = settings.STORE_METRICS.get('TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    if not (request.user.is_staff or (token and constant_time_compare(authorization, f'Bearer {token}'))):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def export_orders(request):
+    """
+    Потоковая выгрузка заказов с позициями для сотрудников:
+    ?format=csv|jsonl&date_from=ГГГГ-ММ-ДД&date_to=ГГГГ-ММ-ДД&status=new&status=shipped
+    """
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    params = OrderExportSerializer(data=request.GET)
+    if not params.is_valid():
+        return JsonResponse(params.errors, status=400)
+    data = params.validated_data
+    queryset = filter_orders(Order.objects.all(), data.get('date_from'), data.get('date_to'), data.get('status'))
+    return export_response(queryset, data['format'], request)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def sales_report(request):
+    """Продажи за период из дневных сводок: ?date_from=&date_to= (по умолчанию 30 дней), ?top= — число книг."""
+    params = SalesReportSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    data = params.validated_data
+    report = build_sales_report(data['date_from'], data['date_to'], data['top'])
+    return Response(SalesReportResultSerializer(report).data)
+
+def serve_media(request, path):
+    """
+    Медиафайлы в любом режиме (django.conf.urls.static работает только с DEBUG).
+    С MEDIA_SENDFILE = 'nginx' или 'apache' тело отдает веб-сервер через X-Accel-Redirect/X-Sendfile,
+    иначе — FileResponse, который WSGI-сервер отправляет через sendfile, если умеет.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    stat = os.stat(full_path)
+    immutable = is_content_addressed(path)
+    etag = quote_etag(os.path.splitext(os.path.basename(path))[0] if immutable else f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_SENDFILE == 'nginx':
+        response = HttpResponse(content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+        # Заголовок должен быть ASCII: кириллица и пробелы в старых именах обложек — percent-encoding, nginx его раскодирует
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+    elif settings.MEDIA_SENDFILE == 'apache':
+        response = HttpResponse(content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+        response['X-Sendfile'] = full_path
+    else:
+        response = FileResponse(open(full_path, 'rb'))
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = IMMUTABLE_MEDIA_CACHE_CONTROL if immutable else MEDIA_CACHE_CONTROL
+    return response